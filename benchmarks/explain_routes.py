@@ -0,0 +1,211 @@
+"""Show EXPLAIN ANALYZE plans of each route's hot query, before and after the
+workload indexes of migrations/0003_workload_indexes.sql.
+
+"After" runs against the database as is. "Before" drops WORKLOAD_INDEXES
+inside a transaction that is rolled back afterwards; DROP INDEX holds an
+exclusive lock on the table until then, so point this at a benchmark
+database, not production.
+
+    python benchmarks/explain_routes.py [--remote] [--route views.rooms]
+"""
+
+import argparse
+import os
+import re
+
+import psycopg2
+
+WORKLOAD_INDEXES = (
+    "idx_bookings_start_date_booking_id",
+    "idx_bookings_customer_id",
+    "idx_rentals_booking_id",
+    "idx_rentals_customer_id",
+    "idx_rentals_room",
+    "idx_hotels_chain_id",
+    "idx_hotels_location",
+    "idx_employees_hotel_id",
+    "idx_rooms_capacity_price",
+    "idx_chain_offices_chain_id",
+    "idx_chain_phone_numbers_chain_id",
+    "idx_chain_email_addresses_chain_id",
+    "idx_hotel_phone_numbers_hotel_id",
+    "idx_hotel_email_addresses_hotel_id",
+)
+
+# Sample parameters taken from the data so every query finds something
+SAMPLES_QUERY = r"""SELECT
+                        (SELECT ssn FROM customers ORDER BY customer_id LIMIT 1),
+                        (SELECT ssn FROM employees ORDER BY employee_id LIMIT 1),
+                        (SELECT booking_id FROM bookings ORDER BY start_date DESC LIMIT 1),
+                        (SELECT chain_id FROM chains ORDER BY chain_id LIMIT 1),
+                        (SELECT hotel_id FROM hotels ORDER BY hotel_id LIMIT 1),
+                        (SELECT country FROM hotels ORDER BY hotel_id LIMIT 1),
+                        (SELECT city FROM hotels ORDER BY hotel_id LIMIT 1),
+                        (SELECT last_name FROM customers ORDER BY customer_id LIMIT 1)
+                """
+
+ROUTE_QUERIES = {
+    "auth.login (customer)": (
+        r"""SELECT customer_id, first_name, last_name
+            FROM customers
+            WHERE ssn = %(customer_ssn)s
+        """
+    ),
+    "auth.login (employee)": (
+        r"""SELECT employee_id, first_name, last_name
+            FROM employees
+            WHERE ssn = %(employee_ssn)s
+        """
+    ),
+    "views.hotels": (
+        r"""SELECT chains.chain_name, hotels.hotel_id, hotels.city, hotels.stars
+            FROM hotels
+            JOIN chains
+            ON hotels.chain_id = chains.chain_id
+            WHERE chains.chain_id = %(chain_id)s
+            ORDER BY hotels.hotel_id
+        """
+    ),
+    "views.rooms": (
+        r"""SELECT chains.chain_name, hotels.stars, rooms.room_number, rooms.price
+            FROM rooms
+            JOIN hotels
+            ON rooms.hotel_id = hotels.hotel_id
+            JOIN chains
+            ON hotels.chain_id = chains.chain_id
+            JOIN view_types
+            ON rooms.view_type = view_types.id
+            WHERE hotels.country = %(country)s
+                AND hotels.city = %(city)s
+                AND rooms.capacity = 2
+                AND rooms.price <= 200
+            ORDER BY hotels.chain_id, rooms.hotel_id, rooms.room_number
+            LIMIT 51
+        """
+    ),
+    "views.get_available_rooms": (
+        r"""SELECT *
+            FROM get_available_rooms(
+                current_date, current_date + 3, filter_hotel_id => %(hotel_id)s
+            )
+        """
+    ),
+    "views.bookings": (
+        r"""SELECT chains.chain_name, bookings.hotel_id, bookings.room_number,
+                bookings.start_date, customers.last_name, rentals.rental_id,
+                bookings.booking_id
+            FROM bookings
+            JOIN customers
+            ON bookings.customer_id = customers.customer_id
+            JOIN hotels
+            ON bookings.hotel_id = hotels.hotel_id
+            JOIN chains
+            ON hotels.chain_id = chains.chain_id
+            LEFT OUTER JOIN rentals
+            ON bookings.booking_id = rentals.booking_id
+            ORDER BY bookings.start_date, bookings.booking_id
+            LIMIT 51
+        """
+    ),
+    "views.bookings (search)": (
+        r"""SELECT bookings.booking_id, customers.first_name, customers.last_name
+            FROM bookings
+            JOIN customers
+            ON bookings.customer_id = customers.customer_id
+            WHERE customers.last_name ILIKE '%%' || %(last_name)s || '%%'
+            ORDER BY bookings.start_date, bookings.booking_id
+            LIMIT 51
+        """
+    ),
+    "views.rent": (
+        r"""SELECT rentals.paid_amount
+            FROM rentals
+            WHERE rentals.booking_id = %(booking_id)s
+        """
+    ),
+    "views.employees (hotel)": (
+        r"""SELECT employee_id, first_name, last_name
+            FROM employees
+            WHERE hotel_id = %(hotel_id)s
+        """
+    ),
+}
+
+
+def connect(remote):
+    return psycopg2.connect(
+        host=os.environ.get("EHOTELS_DB_HOST") if remote else "localhost",
+        port=5432,
+        dbname="ehotels",
+        user=os.environ.get("EHOTELS_DB_USER"),
+        password=os.environ.get("EHOTELS_DB_PASSWORD"),
+    )
+
+
+def explain(cursor, query, samples):
+    cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + query, samples)
+    plan = [row[0] for row in cursor.fetchall()]
+    execution = next(
+        (
+            float(re.search(r"[\d.]+", line).group(0))
+            for line in plan
+            if line.startswith("Execution Time")
+        ),
+        None,
+    )
+    return plan, execution
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--remote", action="store_true")
+    parser.add_argument("--route", action="append", choices=list(ROUTE_QUERIES))
+    args = parser.parse_args()
+    routes = args.route or list(ROUTE_QUERIES)
+
+    conn = connect(args.remote)
+    cursor = conn.cursor()
+    cursor.execute(SAMPLES_QUERY)
+    samples = dict(
+        zip(
+            (
+                "customer_ssn",
+                "employee_ssn",
+                "booking_id",
+                "chain_id",
+                "hotel_id",
+                "country",
+                "city",
+                "last_name",
+            ),
+            cursor.fetchone(),
+        )
+    )
+
+    after = {route: explain(cursor, ROUTE_QUERIES[route], samples) for route in routes}
+
+    cursor.execute(
+        "SELECT indexname FROM pg_indexes WHERE indexname = ANY(%s)",
+        (list(WORKLOAD_INDEXES),),
+    )
+    for (index,) in cursor.fetchall():
+        cursor.execute(f"DROP INDEX {index}")
+    before = {route: explain(cursor, ROUTE_QUERIES[route], samples) for route in routes}
+    conn.rollback()
+    conn.close()
+
+    for route in routes:
+        print(f"=== {route} ===")
+        print("--- before ---")
+        print("\n".join(before[route][0]))
+        print("--- after ---")
+        print("\n".join(after[route][0]))
+        print()
+
+    print(f"{'route':<32}{'before (ms)':>14}{'after (ms)':>14}")
+    for route in routes:
+        print(f"{route:<32}{before[route][1]:>14.3f}{after[route][1]:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""Generate a synthetic eHotels dataset for benchmarks.
+
+At scale factor 1: 5 chains of 20 hotels with 40 rooms each (4,000 rooms),
+20,000 customers, one manager per hotel, and `--years` of back-to-back
+bookings per room ending six months from today. Stays are 1-7 nights with
+short gaps, so most rooms are booked most days and bookings of different
+rooms overlap heavily, while a single room never has overlapping bookings.
+Past bookings are usually checked in as rentals, and some gaps are filled
+by walk-in rentals.
+
+Rows are appended with COPY. Run `python migrate.py up` first.
+
+    python benchmarks/generate_data.py --scale 2 [--remote]
+"""
+
+import argparse
+import io
+import os
+import random
+import uuid
+from datetime import date, timedelta
+
+import psycopg2
+
+LOCATIONS = (
+    ("Ottawa", "Ontario", "Canada"),
+    ("Toronto", "Ontario", "Canada"),
+    ("Montreal", "Quebec", "Canada"),
+    ("Vancouver", "British Columbia", "Canada"),
+    ("Calgary", "Alberta", "Canada"),
+    ("Halifax", "Nova Scotia", "Canada"),
+    ("New York", "New York", "United States"),
+    ("Boston", "Massachusetts", "United States"),
+    ("Chicago", "Illinois", "United States"),
+    ("Seattle", "Washington", "United States"),
+    ("Austin", "Texas", "United States"),
+    ("Miami", "Florida", "United States"),
+    ("Denver", "Colorado", "United States"),
+    ("San Diego", "California", "United States"),
+    ("Mexico City", None, "Mexico"),
+    ("Cancun", None, "Mexico"),
+)
+FIRST_NAMES = (
+    "Olivia Liam Emma Noah Amelia Oliver Sophia Elijah Charlotte Lucas Mia Mateo "
+    "Chloe Leo Zoe Wei Aiko Priya Omar Fatima Juan Camila Kofi Amara Ivan"
+).split()
+LAST_NAMES = (
+    "Smith Tremblay Martin Roy Nguyen Lee Brown Wilson Garcia Rodriguez Patel "
+    "Singh Kim Chen Wong Gagnon Johnson Williams Lopez Hernandez Cohen Okafor "
+    "Ivanov Fischer Rossi"
+).split()
+STREETS = "Main King Queen Elm Maple Oak Bank Rideau".split()
+
+CHAINS_PER_SCALE = 5
+HOTELS_PER_CHAIN = 20
+ROOMS_PER_HOTEL = 40
+CUSTOMERS_PER_SCALE = 20000
+# Rows buffered in memory per COPY
+COPY_BATCH = 100000
+
+
+def connect(remote):
+    return psycopg2.connect(
+        host=os.environ.get("EHOTELS_DB_HOST") if remote else "localhost",
+        port=5432,
+        dbname="ehotels",
+        user=os.environ.get("EHOTELS_DB_USER"),
+        password=os.environ.get("EHOTELS_DB_PASSWORD"),
+    )
+
+
+def copy_rows(cursor, table, columns, rows):
+    """COPY `rows` (tuples, None for NULL) into `table` in batches."""
+    count = 0
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(
+            "\t".join("\\N" if value is None else str(value) for value in row) + "\n"
+        )
+        count += 1
+        if count % COPY_BATCH == 0:
+            buffer.seek(0)
+            cursor.copy_from(buffer, table, columns=columns)
+            buffer = io.StringIO()
+    buffer.seek(0)
+    cursor.copy_from(buffer, table, columns=columns)
+    return count
+
+
+def next_id(cursor, table, column):
+    cursor.execute(f"SELECT COALESCE(MAX({column}), 0) + 1 FROM {table}")
+    return cursor.fetchone()[0]
+
+
+def person(rng):
+    city, province_or_state, country = rng.choice(LOCATIONS)
+    return (
+        rng.choice(FIRST_NAMES),
+        rng.choice(LAST_NAMES),
+        str(rng.randint(1, 9999)),
+        rng.choice(STREETS),
+        city,
+        province_or_state,
+        country,
+        f"{rng.randint(10000, 99999)}",
+    )
+
+
+def stays(rng, first_day, last_day):
+    """Yield non-overlapping (start_date, end_date, walk_in) stays of a room."""
+    day = first_day + timedelta(days=rng.randint(0, 7))
+    while day < last_day:
+        nights = rng.choice((1, 1, 2, 2, 3, 3, 4, 5, 7))
+        yield day, day + timedelta(days=nights), False
+        day += timedelta(days=nights)
+        gap = rng.choice((0, 0, 0, 1, 1, 2, 3, 5))
+        if gap and rng.random() < 0.1:
+            yield day, day + timedelta(days=1), True
+        day += timedelta(days=gap)
+
+
+def generate(cursor, scale, years, rng):
+    today = date.today()
+    first_day = today - timedelta(days=int(365 * years) - 182)
+    last_day = today + timedelta(days=182)
+
+    cursor.execute("SELECT id FROM view_types")
+    view_types = [row[0] for row in cursor.fetchall()] or [None]
+    cursor.execute(
+        "SELECT position_id FROM positions WHERE LOWER(position_name) = 'manager'"
+    )
+    manager = cursor.fetchone()
+    if manager is None:
+        raise SystemExit("No manager position: load seed.sql first")
+
+    num_chains = max(1, round(CHAINS_PER_SCALE * scale))
+    chain_id = next_id(cursor, "chains", "chain_id")
+    chains = list(range(chain_id, chain_id + num_chains))
+    copy_rows(
+        cursor,
+        "chains",
+        ("chain_id", "chain_name"),
+        ((chain, f"Synthetic Chain {chain}") for chain in chains),
+    )
+
+    hotel_id = next_id(cursor, "hotels", "hotel_id")
+    hotels = []
+    for chain in chains:
+        for _ in range(HOTELS_PER_CHAIN):
+            city, province_or_state, country = rng.choice(LOCATIONS)
+            hotels.append(
+                (
+                    hotel_id,
+                    str(rng.randint(1, 999)),
+                    rng.choice(STREETS),
+                    city,
+                    province_or_state,
+                    country,
+                    f"{rng.randint(10000, 99999)}",
+                    rng.choice((2, 3, 3, 4, 4, 5)),
+                    chain,
+                )
+            )
+            hotel_id += 1
+    copy_rows(
+        cursor,
+        "hotels",
+        (
+            "hotel_id",
+            "street_number",
+            "street_name",
+            "city",
+            "province_or_state",
+            "country",
+            "zip",
+            "stars",
+            "chain_id",
+        ),
+        hotels,
+    )
+
+    rooms = []
+    for hotel in hotels:
+        stars = hotel[7]
+        for number in range(ROOMS_PER_HOTEL):
+            capacity = rng.choice((1, 2, 2, 2, 3, 4, 5))
+            price = round(40 * stars + 25 * capacity + rng.uniform(-20, 60), 2)
+            rooms.append(
+                (
+                    hotel[0],
+                    f"{100 * (number // 20 + 1) + number % 20 + 1}",
+                    capacity,
+                    price,
+                    rng.choice(view_types),
+                    rng.random() < 0.3,
+                    rng.random() < 0.9,
+                    rng.random() < 0.8,
+                    rng.random() < 0.5,
+                )
+            )
+    copy_rows(
+        cursor,
+        "rooms",
+        (
+            "hotel_id",
+            "room_number",
+            "capacity",
+            "price",
+            "view_type",
+            "extensible",
+            "tv",
+            "air_condition",
+            "fridge",
+        ),
+        rooms,
+    )
+
+    num_customers = max(1, round(CUSTOMERS_PER_SCALE * scale))
+    customer_id = next_id(cursor, "customers", "customer_id")
+    customers = range(customer_id, customer_id + num_customers)
+    copy_rows(
+        cursor,
+        "customers",
+        (
+            "customer_id",
+            "ssn",
+            "registration_date",
+            "first_name",
+            "last_name",
+            "street_number",
+            "street_name",
+            "city",
+            "province_or_state",
+            "country",
+            "zip",
+        ),
+        (
+            (
+                customer,
+                f"C{customer:010d}",
+                first_day - timedelta(days=rng.randint(0, 365)),
+            )
+            + person(rng)
+            for customer in customers
+        ),
+    )
+
+    employee_id = next_id(cursor, "employees", "employee_id")
+    copy_rows(
+        cursor,
+        "employees",
+        (
+            "employee_id",
+            "ssn",
+            "first_name",
+            "last_name",
+            "street_number",
+            "street_name",
+            "city",
+            "province_or_state",
+            "country",
+            "zip",
+            "position_id",
+            "hotel_id",
+        ),
+        (
+            (employee_id + i, f"E{employee_id + i:010d}")
+            + person(rng)
+            + (manager[0], hotel[0])
+            for i, hotel in enumerate(hotels)
+        ),
+    )
+
+    bookings = []
+    rentals = []
+    for hotel, room_number, _, price, *_ in rooms:
+        for start_date, end_date, walk_in in stays(rng, first_day, last_day):
+            customer = rng.choice(customers)
+            paid = round(price * (end_date - start_date).days, 2)
+            if walk_in:
+                if start_date <= today:
+                    rentals.append(
+                        (uuid.uuid4(), customer, None, hotel, room_number)
+                        + (start_date, end_date, paid)
+                    )
+                continue
+            booking_id = uuid.uuid4()
+            bookings.append(
+                (booking_id, customer, hotel, room_number, start_date, end_date)
+            )
+            if start_date <= today and rng.random() < 0.85:
+                rentals.append(
+                    (uuid.uuid4(), customer, booking_id, hotel, room_number)
+                    + (start_date, end_date, paid)
+                )
+
+    copy_rows(
+        cursor,
+        "bookings",
+        (
+            "booking_id",
+            "customer_id",
+            "hotel_id",
+            "room_number",
+            "start_date",
+            "end_date",
+        ),
+        bookings,
+    )
+    copy_rows(
+        cursor,
+        "rentals",
+        (
+            "rental_id",
+            "customer_id",
+            "booking_id",
+            "hotel_id",
+            "room_number",
+            "start_date",
+            "end_date",
+            "paid_amount",
+        ),
+        rentals,
+    )
+
+    # Explicit ids were used above, so move the sequences past them
+    for table, column in (
+        ("chains", "chain_id"),
+        ("hotels", "hotel_id"),
+        ("customers", "customer_id"),
+        ("employees", "employee_id"),
+    ):
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), MAX({column})) FROM {table}"
+        )
+
+    return {
+        "chains": len(chains),
+        "hotels": len(hotels),
+        "rooms": len(rooms),
+        "customers": num_customers,
+        "employees": len(hotels),
+        "bookings": len(bookings),
+        "rentals": len(rentals),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--remote", action="store_true")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--years", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=2132)
+    args = parser.parse_args()
+
+    conn = connect(args.remote)
+    cursor = conn.cursor()
+    counts = generate(cursor, args.scale, args.years, random.Random(args.seed))
+    conn.commit()
+
+    conn.autocommit = True
+    cursor.execute("ANALYZE")
+    cursor.execute("SELECT refresh_available_rooms_per_area()")
+    cursor.execute("SELECT refresh_daily_hotel_stats()")
+    cursor.close()
+    conn.close()
+
+    for table, count in counts.items():
+        print(f"{table:<12}{count:>12,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""Drive a running eHotels server with concurrent users and report latency.
+
+Each scenario runs for `--duration` seconds with `--concurrency` threads, each
+logged in as its own customer or employee, and reports throughput and
+p50/p95/p99 latency. Sample hotels, rooms and users are read from the
+database, so load it first with generate_data.py.
+
+    python main.py &
+    python benchmarks/load_test.py --url http://localhost:5000 --concurrency 16
+
+Scenarios: rooms-search (POST /rooms/ with random filters, sometimes with
+dates), book-room (POST /book-room/ with random future dates; conflicts are
+expected), available-rooms (GET /get-available-rooms/ as a hotel employee)
+and bookings-search (POST /bookings/ by customer name).
+"""
+
+import argparse
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import quote, urlencode
+from urllib.request import HTTPCookieProcessor, build_opener
+
+import psycopg2
+
+ROOMS_FORM_FIELDS = (
+    "start-date",
+    "end-date",
+    "chain",
+    "stars",
+    "num-rooms",
+    "country",
+    "province-or-state",
+    "city",
+    "capacity",
+    "price",
+)
+
+SAMPLES_QUERIES = {
+    "rooms": r"""SELECT hotel_id, room_number FROM rooms
+                ORDER BY random() LIMIT 2000
+            """,
+    "hotels": r"""SELECT chains.chain_name, hotels.country,
+                    hotels.province_or_state, hotels.city
+                FROM hotels
+                JOIN chains
+                ON hotels.chain_id = chains.chain_id
+                ORDER BY random() LIMIT 200
+            """,
+    "customers": r"""SELECT ssn, first_name, last_name FROM customers
+                    ORDER BY random() LIMIT 1000
+                """,
+    "employees": r"""SELECT ssn FROM employees
+                    WHERE hotel_id IS NOT NULL
+                    ORDER BY random() LIMIT 200
+                """,
+}
+
+
+def connect(remote):
+    return psycopg2.connect(
+        host=os.environ.get("EHOTELS_DB_HOST") if remote else "localhost",
+        port=5432,
+        dbname="ehotels",
+        user=os.environ.get("EHOTELS_DB_USER"),
+        password=os.environ.get("EHOTELS_DB_PASSWORD"),
+    )
+
+
+def load_samples(remote):
+    conn = connect(remote)
+    cursor = conn.cursor()
+    samples = {}
+    for name, query in SAMPLES_QUERIES.items():
+        cursor.execute(query)
+        samples[name] = cursor.fetchall()
+    conn.close()
+    return samples
+
+
+def random_stay(rng, max_nights=4):
+    start_date = date.today() + timedelta(days=rng.randint(1, 180))
+    return start_date, start_date + timedelta(days=rng.randint(1, max_nights))
+
+
+class Client:
+    """One logged-in user with its own cookie jar."""
+
+    def __init__(self, url, kind, ssn):
+        self.url = url.rstrip("/")
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()))
+        self.request("/login", {"customer-or-employee-radio": kind, "ssn": ssn})
+
+    def request(self, path, form=None):
+        data = urlencode(form).encode() if form is not None else None
+        try:
+            with self.opener.open(self.url + path, data=data, timeout=60) as response:
+                response.read()
+                return response.status
+        except HTTPError as e:
+            return e.code
+
+
+def rooms_search(client, samples, rng):
+    form = dict.fromkeys(ROOMS_FORM_FIELDS, "")
+    if rng.random() < 0.3:
+        start_date, end_date = random_stay(rng)
+        form["start-date"] = start_date.isoformat()
+        form["end-date"] = end_date.isoformat()
+    chain_name, country, province_or_state, city = rng.choice(samples["hotels"])
+    form["country"] = country
+    if rng.random() < 0.5:
+        form["city"] = city
+    if rng.random() < 0.3:
+        form["chain"] = chain_name
+    if rng.random() < 0.5:
+        form["capacity"] = str(rng.randint(1, 5))
+    if rng.random() < 0.5:
+        form["price"] = str(rng.randrange(150, 450, 50))
+    if rng.random() < 0.3:
+        form["stars"] = str(rng.randint(2, 5))
+    return client.request("/rooms/", form)
+
+
+def book_room(client, samples, rng):
+    hotel_id, room_number = rng.choice(samples["rooms"])
+    start_date, end_date = random_stay(rng)
+    return client.request(
+        f"/book-room/{hotel_id}/{quote(room_number)}",
+        {"start-date": start_date.isoformat(), "end-date": end_date.isoformat()},
+    )
+
+
+def available_rooms(client, samples, rng):
+    start_date, end_date = random_stay(rng)
+    customer_ssn = rng.choice(samples["customers"])[0]
+    return client.request(
+        "/get-available-rooms/?"
+        + urlencode(
+            {
+                "start-date": start_date.isoformat(),
+                "end-date": end_date.isoformat(),
+                "customer-ssn": customer_ssn,
+            }
+        )
+    )
+
+
+def bookings_search(client, samples, rng):
+    _, first_name, last_name = rng.choice(samples["customers"])
+    form = {
+        "first-name": "",
+        "last-name": last_name[: rng.randint(2, len(last_name))],
+    }
+    if rng.random() < 0.3:
+        form["first-name"] = first_name[:3]
+    return client.request("/bookings/", form)
+
+
+# name: (function, user type)
+SCENARIOS = {
+    "rooms-search": (rooms_search, "customer"),
+    "book-room": (book_room, "customer"),
+    "available-rooms": (available_rooms, "employee"),
+    "bookings-search": (bookings_search, "employee"),
+}
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values))) - 1)
+    return sorted_values[max(index, 0)]
+
+
+def run_scenario(name, args, samples):
+    function, kind = SCENARIOS[name]
+    users = samples["customers"] if kind == "customer" else samples["employees"]
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker(seed):
+        nonlocal errors
+
+        rng = random.Random(seed)
+        client = Client(args.url, kind, rng.choice(users)[0])
+        deadline = time.perf_counter() + args.duration
+        warmup = time.perf_counter() + args.warmup
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status = function(client, samples, rng)
+            except OSError:
+                status = None
+            duration = time.perf_counter() - start
+            if start < warmup:
+                continue
+            with lock:
+                latencies.append(duration)
+                if status is None or status >= 500:
+                    errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(worker, range(args.seed, args.seed + args.concurrency)))
+    elapsed = time.perf_counter() - started - args.warmup
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed > 0 else float("nan"),
+        "p50": percentile(latencies, 50) * 1000,
+        "p95": percentile(latencies, 95) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--remote", action="store_true")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--seed", type=int, default=2132)
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS))
+    args = parser.parse_args()
+
+    samples = load_samples(args.remote)
+
+    print(
+        f"{'scenario':<18}{'requests':>10}{'errors':>8}{'req/s':>9}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    )
+    for name in args.scenario or list(SCENARIOS):
+        result = run_scenario(name, args, samples)
+        print(
+            f"{name:<18}{result['requests']:>10}{result['errors']:>8}"
+            f"{result['rps']:>9.1f}{result['p50']:>10.1f}"
+            f"{result['p95']:>10.1f}{result['p99']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
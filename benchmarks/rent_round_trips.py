@@ -0,0 +1,233 @@
+"""Compare the old and current statements of the /rent/ check-in pages.
+
+The old booking page ran three SELECTs (booking and price, customer, paid
+amount) and the old check-ins an extra SELECT before each INSERT. The current
+pages use one joined SELECT and one INSERT ... SELECT ... RETURNING, imported
+from website/views.py so that what is timed is what the pages run. Each
+flow runs `--iterations` times on sample bookings and customers, inside a
+transaction that is rolled back, and the latency per page is reported.
+Statements of both versions are prepared, as website/query_builder.py does,
+so planning time is left out and what remains is mostly round trips: the gap
+grows with the latency to the database, so compare with and without --remote.
+
+    python benchmarks/rent_round_trips.py [--remote] [--iterations 500]
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import re
+import sys
+import time
+from datetime import date, timedelta
+
+import psycopg2
+
+# The current statements are the ones the pages run
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from website.views import (RENT_BOOKING_QUERY, RENT_CHECK_IN_QUERY,  # noqa: E402
+                           RENT_WALK_IN_QUERY)
+
+SAMPLES_QUERIES = {
+    "bookings": r"""SELECT bookings.booking_id
+                    FROM bookings
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM rentals WHERE rentals.booking_id = bookings.booking_id
+                    )
+                    ORDER BY random() LIMIT 1000
+                """,
+    "customers": r"""SELECT ssn FROM customers ORDER BY random() LIMIT 1000""",
+    "rooms": r"""SELECT hotel_id, room_number FROM rooms ORDER BY random() LIMIT 1000""",
+}
+
+OLD_BOOKING_QUERIES = (
+    r"""SELECT bookings.hotel_id, bookings.room_number, bookings.start_date,
+            bookings.end_date, rooms.price
+        FROM bookings
+        JOIN rooms
+        ON bookings.hotel_id = rooms.hotel_id
+            AND bookings.room_number = rooms.room_number
+        WHERE bookings.booking_id = %s
+    """,
+    r"""SELECT customers.customer_id, customers.ssn, customers.registration_date,
+            customers.first_name, customers.last_name
+        FROM bookings
+        JOIN customers
+        ON bookings.customer_id = customers.customer_id
+        WHERE bookings.booking_id = %s
+    """,
+    r"""SELECT rentals.paid_amount FROM rentals WHERE rentals.booking_id = %s""",
+)
+
+OLD_RENT_BOOKING_QUERY = r"""INSERT INTO rentals
+                            (customer_id, booking_id, hotel_id, room_number, start_date, end_date, paid_amount)
+                            VALUES (%s, %s, %s, %s, %s, %s, %s)
+                            RETURNING rental_id
+                        """
+
+OLD_WALK_IN_QUERY = r"""INSERT INTO rentals
+                        (customer_id, hotel_id, room_number, start_date, end_date, paid_amount)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                        RETURNING rental_id
+                    """
+
+
+def connect(remote):
+    return psycopg2.connect(
+        host=os.environ.get("EHOTELS_DB_HOST") if remote else "localhost",
+        port=5432,
+        dbname="ehotels",
+        user=os.environ.get("EHOTELS_DB_USER"),
+        password=os.environ.get("EHOTELS_DB_PASSWORD"),
+    )
+
+
+# Names of the statements prepared on the connection
+prepared = set()
+
+
+def run(cursor, sql, params):
+    name = "bench_" + hashlib.sha1(sql.encode()).hexdigest()[:16]
+    if name not in prepared:
+        count = iter(range(1, len(params) + 1))
+        cursor.execute(
+            f"PREPARE {name} AS " + re.sub("%s", lambda _: f"${next(count)}", sql)
+        )
+        prepared.add(name)
+    cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+
+
+def old_booking_page(cursor, booking_id):
+    rows = []
+    for query in OLD_BOOKING_QUERIES:
+        run(cursor, query, (booking_id,))
+        rows.append(cursor.fetchone())
+    return rows
+
+
+def booking_page(cursor, booking_id):
+    run(cursor, RENT_BOOKING_QUERY, (booking_id,))
+    return cursor.fetchone()
+
+
+def old_check_in(cursor, booking_id):
+    booking, customer, _ = old_booking_page(cursor, booking_id)
+    run(
+        cursor,
+        OLD_RENT_BOOKING_QUERY,
+        (customer[0], booking_id, booking[0], booking[1], booking[2], booking[3], 100),
+    )
+    return cursor.fetchone()
+
+
+def check_in(cursor, booking_id):
+    run(cursor, RENT_CHECK_IN_QUERY, (100, booking_id))
+    return cursor.fetchone()
+
+
+def old_walk_in(cursor, ssn, hotel_id, room_number, start_date):
+    run(cursor, "SELECT customer_id FROM customers WHERE ssn = %s", (ssn,))
+    customer_id = cursor.fetchone()[0]
+    run(
+        cursor,
+        OLD_WALK_IN_QUERY,
+        (
+            customer_id,
+            hotel_id,
+            room_number,
+            start_date,
+            start_date + timedelta(1),
+            100,
+        ),
+    )
+    return cursor.fetchone()
+
+
+def walk_in(cursor, ssn, hotel_id, room_number, start_date):
+    run(
+        cursor,
+        RENT_WALK_IN_QUERY,
+        (hotel_id, room_number, start_date, start_date + timedelta(1), 100, ssn),
+    )
+    return cursor.fetchone()
+
+
+# name: (old function, current function, statements before, statements now)
+FLOWS = {
+    "booking page": (old_booking_page, booking_page, 3, 1),
+    "check in booking": (old_check_in, check_in, 4, 1),
+    "walk-in check in": (old_walk_in, walk_in, 2, 1),
+}
+
+
+def measure(conn, function, arguments):
+    cursor = conn.cursor()
+    timings = []
+    for args in arguments:
+        start = time.perf_counter()
+        function(cursor, *args)
+        timings.append(time.perf_counter() - start)
+    cursor.close()
+    conn.rollback()
+    timings.sort()
+    return (
+        sum(timings) / len(timings) * 1000,
+        timings[len(timings) // 2] * 1000,
+        timings[int(len(timings) * 0.95)] * 1000,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--remote", action="store_true")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=2132)
+    args = parser.parse_args()
+
+    conn = connect(args.remote)
+    cursor = conn.cursor()
+    samples = {}
+    for name, query in SAMPLES_QUERIES.items():
+        cursor.execute(query)
+        samples[name] = cursor.fetchall()
+    cursor.close()
+    conn.rollback()
+
+    rng = random.Random(args.seed)
+    # Walk-ins far in the future so they cannot collide with the data
+    first_day = date(2100, 1, 1)
+    arguments = {
+        "booking page": [
+            rng.choice(samples["bookings"]) for _ in range(args.iterations)
+        ],
+        "check in booking": [
+            rng.choice(samples["bookings"]) for _ in range(args.iterations)
+        ],
+        "walk-in check in": [
+            (rng.choice(samples["customers"])[0],)
+            + rng.choice(samples["rooms"])
+            + (first_day + timedelta(days=i),)
+            for i in range(args.iterations)
+        ],
+    }
+
+    print(
+        f"{'flow':<18}{'version':<9}{'statements':>11}"
+        f"{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}"
+    )
+    for name, (old, current, old_statements, statements) in FLOWS.items():
+        for version, function, count in (
+            ("before", old, old_statements),
+            ("after", current, statements),
+        ):
+            mean, p50, p95 = measure(conn, function, arguments[name])
+            print(
+                f"{name:<18}{version:<9}{count:>11}"
+                f"{mean:>10.2f}{p50:>10.2f}{p95:>10.2f}"
+            )
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
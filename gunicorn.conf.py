@@ -0,0 +1,27 @@
+import multiprocessing
+import os
+
+from website.jobs import start_scheduler
+from website.pool import close_pool, reset_pool
+
+bind = os.environ.get("EHOTELS_BIND", "localhost:8000")
+workers = int(os.environ.get("EHOTELS_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("EHOTELS_THREADS", 4))
+worker_class = "gthread"
+accesslog = "-"
+
+# Import the app once in the master so workers fork with it loaded
+preload_app = True
+
+
+def pre_fork(server, worker):
+    # create_app opened the pool in the master; workers must not share its
+    # connections
+    close_pool()
+
+
+def post_fork(server, worker):
+    reset_pool()
+    # Threads do not survive a fork, so each worker starts its own scheduler;
+    # the advisory locks keep the jobs from running in several at once
+    start_scheduler()
@@ -1,6 +1,8 @@
 import argparse
+import os
 
 from website import create_app
+from website.jobs import start_scheduler
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--remote", action="store_true")
@@ -9,6 +11,10 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     app = create_app(remote=args.remote)
+    # With the reloader on, this script also runs in a parent process that
+    # only watches files; schedule jobs in the child that serves requests
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_scheduler()
 
     # app.run(host="0.0.0.0") # externally visible
     app.run(host="localhost", debug=True)
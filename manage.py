@@ -0,0 +1,112 @@
+import argparse
+import os
+import threading
+
+from website import create_app, db
+from website.bulk_import import IMPORT_COLUMNS, import_file
+from website.jobs import run_due_jobs, run_scheduler
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--remote", action="store_true")
+subparsers = parser.add_subparsers(dest="command", required=True)
+
+subparsers.add_parser(
+    "refresh-counters", help="recompute chains.num_hotels and hotels.num_rooms"
+)
+
+subparsers.add_parser(
+    "refresh-views", help="refresh available_rooms_per_area without blocking readers"
+)
+
+subparsers.add_parser(
+    "refresh-rollups", help="recompute the queued days of daily_hotel_stats"
+)
+
+jobs_parser = subparsers.add_parser(
+    "run-jobs",
+    help="run the background jobs in this process (set EHOTELS_JOBS=0 for the "
+    "web servers)",
+)
+jobs_parser.add_argument(
+    "--once", action="store_true", help="run the due jobs once and exit"
+)
+
+import_parser = subparsers.add_parser(
+    "import", help="bulk-load chains, hotels or rooms from CSV or JSON lines"
+)
+import_parser.add_argument("kind", choices=list(IMPORT_COLUMNS))
+import_parser.add_argument("path")
+import_parser.add_argument(
+    "--format",
+    choices=["csv", "json"],
+    help="defaults to the file extension (.csv, .json, .jsonl)",
+)
+
+
+def refresh_counters(args):
+    cursor = db.cursor()
+    cursor.execute("SELECT refresh_counters()")
+    db.commit()
+    cursor.close()
+    print("Refreshed num_hotels and num_rooms")
+
+
+def refresh_views(args):
+    cursor = db.cursor()
+    cursor.execute("SELECT refresh_available_rooms_per_area()")
+    db.commit()
+    cursor.close()
+    print("Refreshed available_rooms_per_area")
+
+
+def refresh_rollups(args):
+    cursor = db.cursor()
+    cursor.execute("SELECT refresh_daily_hotel_stats()")
+    num_days = cursor.fetchone()[0]
+    db.commit()
+    cursor.close()
+    print(f"Refreshed {num_days} days of daily_hotel_stats")
+
+
+def run_jobs(args):
+    if args.once:
+        for name, outcome in run_due_jobs().items():
+            print(f"{name}: {outcome}")
+        return
+    try:
+        run_scheduler(threading.Event())
+    except KeyboardInterrupt:
+        pass
+
+
+def import_inventory(args):
+    file_format = args.format
+    if file_format is None:
+        extension = os.path.splitext(args.path)[1].lower()
+        file_format = "json" if extension in (".json", ".jsonl", ".ndjson") else "csv"
+
+    with open(args.path, "rb") as file:
+        merged, errors = import_file(args.kind, file, file_format)
+
+    if errors:
+        for error in errors:
+            print(error)
+        raise SystemExit(1)
+    print(f"Imported {merged} {args.kind}")
+
+
+commands = {
+    "refresh-counters": refresh_counters,
+    "refresh-views": refresh_views,
+    "refresh-rollups": refresh_rollups,
+    "run-jobs": run_jobs,
+    "import": import_inventory,
+}
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    app = create_app(remote=args.remote)
+
+    with app.app_context():
+        commands[args.command](args)
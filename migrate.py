@@ -0,0 +1,101 @@
+import argparse
+import os
+
+import psycopg2
+
+from website.migrations import (
+    applied_migrations,
+    baseline,
+    load_migrations,
+    migrate,
+    reset,
+    seed,
+)
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--remote", action="store_true")
+subparsers = parser.add_subparsers(dest="command", required=True)
+
+subparsers.add_parser("status", help="list applied and pending migrations")
+
+up_parser = subparsers.add_parser("up", help="apply pending migrations")
+up_parser.add_argument("--to", type=int, help="stop after this version")
+
+baseline_parser = subparsers.add_parser(
+    "baseline",
+    help="mark migrations up to VERSION as applied, for a database created "
+    "with the old db_setup.sql",
+)
+baseline_parser.add_argument("version", type=int)
+
+subparsers.add_parser("seed", help="load the sample data from seed.sql")
+
+reset_parser = subparsers.add_parser(
+    "reset", help="drop everything, apply all migrations and load the sample data"
+)
+reset_parser.add_argument("--yes", action="store_true", required=True)
+
+
+def connect(remote):
+    conn = psycopg2.connect(
+        host=os.environ.get("EHOTELS_DB_HOST") if remote else "localhost",
+        port=5432,
+        dbname="ehotels",
+        user=os.environ.get("EHOTELS_DB_USER"),
+        password=os.environ.get("EHOTELS_DB_PASSWORD"),
+    )
+    # Migrations manage their own transactions
+    conn.autocommit = True
+    return conn
+
+
+def status(conn, args):
+    applied = applied_migrations(conn)
+    for migration in load_migrations():
+        if migration["version"] not in applied:
+            state = "pending"
+        elif applied[migration["version"]][1] != migration["checksum"]:
+            state = f"applied {applied[migration['version']][2]:%Y-%m-%d %H:%M} (changed since)"
+        else:
+            state = f"applied {applied[migration['version']][2]:%Y-%m-%d %H:%M}"
+        print(f"{migration['filename']:<40} {state}")
+
+
+def up(conn, args):
+    done = migrate(conn, target=args.to)
+    print(f"Applied {len(done)} migration(s)")
+
+
+def mark_baseline(conn, args):
+    baseline(conn, args.version)
+    print(f"Marked migrations up to {args.version} as applied")
+
+
+def load_seed(conn, args):
+    seed(conn)
+    print("Loaded seed.sql")
+
+
+def reset_database(conn, args):
+    reset(conn)
+    migrate(conn)
+    seed(conn)
+    print("Reset the database")
+
+
+commands = {
+    "status": status,
+    "up": up,
+    "baseline": mark_baseline,
+    "seed": load_seed,
+    "reset": reset_database,
+}
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    conn = connect(args.remote)
+    try:
+        commands[args.command](conn, args)
+    finally:
+        conn.close()
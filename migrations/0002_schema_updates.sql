@@ -0,0 +1,254 @@
+-- Schema changes made since db_setup.sql (migration 1): overlap-proof
+-- bookings, incremental counters, the materialized View 1 and the filtered
+-- get_available_rooms. A database created with db_setup.sql is adopted with
+-- `python migrate.py baseline 1` and brought up to date from here.
+
+-- Install btree_gist module (scalar columns in GiST indexes)
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+
+-- Bookings: the exclusion constraint replaces the check_insert_booking trigger
+DROP TRIGGER IF EXISTS trig_check_insert_booking ON bookings;
+DROP FUNCTION IF EXISTS check_insert_booking();
+
+ALTER TABLE bookings
+    -- At least one night: daterange(d, d) is empty and would overlap nothing
+    ADD CONSTRAINT bookings_dates_check CHECK (start_date < end_date),
+    -- A room cannot have two bookings with overlapping [start_date, end_date)
+    ADD CONSTRAINT bookings_no_overlap EXCLUDE USING gist (
+        hotel_id WITH =,
+        room_number WITH =,
+        daterange(start_date, end_date) WITH &&
+    );
+
+
+-- View 1 becomes a materialized view
+DROP VIEW IF EXISTS available_rooms_per_area;
+
+-- Materialized view for number of rooms per area not booked today
+-- Refreshed concurrently (readers are not blocked) by
+-- refresh_available_rooms_per_area(), which records when it last ran in
+-- view_refreshes so pages can show how stale the numbers are.
+CREATE MATERIALIZED VIEW IF NOT EXISTS available_rooms_per_area AS
+    SELECT hotels.country,
+        hotels.province_or_state,
+        hotels.city,
+        COUNT(*) AS num_available_rooms
+    FROM rooms
+    JOIN hotels
+    ON rooms.hotel_id = hotels.hotel_id
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM bookings
+        WHERE bookings.hotel_id = rooms.hotel_id
+            AND bookings.room_number = rooms.room_number
+            AND daterange(bookings.start_date, bookings.end_date) @> current_date
+    )
+    GROUP BY hotels.country, hotels.province_or_state, hotels.city;
+
+CREATE UNIQUE INDEX idx_available_rooms_per_area
+ON available_rooms_per_area(country, province_or_state, city);
+
+
+-- Create view_refreshes table
+CREATE TABLE IF NOT EXISTS view_refreshes (
+    view_name TEXT PRIMARY KEY,
+    refreshed_at TIMESTAMPTZ NOT NULL
+);
+
+
+-- refresh_available_rooms_per_area function
+CREATE OR REPLACE FUNCTION refresh_available_rooms_per_area() RETURNS void AS $refresh_available_rooms_per_area$
+    REFRESH MATERIALIZED VIEW CONCURRENTLY available_rooms_per_area;
+
+    INSERT INTO view_refreshes (view_name, refreshed_at)
+    VALUES ('available_rooms_per_area', now())
+    ON CONFLICT (view_name) DO UPDATE
+    SET refreshed_at = EXCLUDED.refreshed_at;
+$refresh_available_rooms_per_area$ LANGUAGE sql;
+
+
+
+-- Statement-level counter triggers replace the row-level ones
+DROP TRIGGER IF EXISTS trig_num_hotels ON hotels;
+DROP TRIGGER IF EXISTS trig_num_rooms ON rooms;
+
+
+-- num_hotels trigger
+-- Statement-level so a bulk insert/delete adjusts each affected chain once,
+-- by the number of hotels added or removed, instead of recounting all hotels
+-- once per row.
+CREATE OR REPLACE FUNCTION num_hotels() RETURNS TRIGGER AS $num_hotels$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE chains
+            SET num_hotels = chains.num_hotels + delta.num_hotels
+            FROM (
+                SELECT chain_id, COUNT(*) AS num_hotels
+                FROM new_hotels
+                GROUP BY chain_id
+            ) AS delta
+            WHERE chains.chain_id = delta.chain_id;
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE chains
+            SET num_hotels = chains.num_hotels - delta.num_hotels
+            FROM (
+                SELECT chain_id, COUNT(*) AS num_hotels
+                FROM old_hotels
+                GROUP BY chain_id
+            ) AS delta
+            WHERE chains.chain_id = delta.chain_id;
+        END IF;
+        RETURN NULL;
+    END;
+$num_hotels$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trig_num_hotels_insert
+    AFTER INSERT ON hotels
+    REFERENCING NEW TABLE AS new_hotels
+    FOR EACH STATEMENT
+    EXECUTE PROCEDURE num_hotels();
+
+CREATE OR REPLACE TRIGGER trig_num_hotels_delete
+    AFTER DELETE ON hotels
+    REFERENCING OLD TABLE AS old_hotels
+    FOR EACH STATEMENT
+    EXECUTE PROCEDURE num_hotels();
+
+
+-- num_rooms trigger
+CREATE OR REPLACE FUNCTION num_rooms() RETURNS TRIGGER AS $num_rooms$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE hotels
+            SET num_rooms = hotels.num_rooms + delta.num_rooms
+            FROM (
+                SELECT hotel_id, COUNT(*) AS num_rooms
+                FROM new_rooms
+                GROUP BY hotel_id
+            ) AS delta
+            WHERE hotels.hotel_id = delta.hotel_id;
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE hotels
+            SET num_rooms = hotels.num_rooms - delta.num_rooms
+            FROM (
+                SELECT hotel_id, COUNT(*) AS num_rooms
+                FROM old_rooms
+                GROUP BY hotel_id
+            ) AS delta
+            WHERE hotels.hotel_id = delta.hotel_id;
+        END IF;
+        RETURN NULL;
+    END;
+$num_rooms$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trig_num_rooms_insert
+    AFTER INSERT ON rooms
+    REFERENCING NEW TABLE AS new_rooms
+    FOR EACH STATEMENT
+    EXECUTE PROCEDURE num_rooms();
+
+CREATE OR REPLACE TRIGGER trig_num_rooms_delete
+    AFTER DELETE ON rooms
+    REFERENCING OLD TABLE AS old_rooms
+    FOR EACH STATEMENT
+    EXECUTE PROCEDURE num_rooms();
+
+
+-- refresh_counters function
+-- Recomputes num_hotels and num_rooms from scratch, e.g. after a manual edit
+-- with triggers disabled. Run with `python manage.py refresh-counters`.
+CREATE OR REPLACE FUNCTION refresh_counters() RETURNS void AS $refresh_counters$
+    UPDATE chains
+    SET num_hotels = (
+        SELECT COUNT(*)
+        FROM hotels
+        WHERE hotels.chain_id = chains.chain_id
+    );
+
+    UPDATE hotels
+    SET num_rooms = (
+        SELECT COUNT(*)
+        FROM rooms
+        WHERE rooms.hotel_id = hotels.hotel_id
+    );
+$refresh_counters$ LANGUAGE sql;
+
+-- The incremental triggers adjust the counters from here on
+SELECT refresh_counters();
+
+
+-- get_available_rooms takes optional filters; the old two-argument version
+-- would make calls with two arguments ambiguous
+DROP FUNCTION IF EXISTS get_available_rooms(date, date);
+
+
+-- get_available_rooms function
+-- Filters are optional and pushed down into the query so callers do not have
+-- to compute availability for every hotel and filter afterwards. Written in
+-- SQL (not plpgsql) so the planner can inline it into the calling query.
+CREATE OR REPLACE FUNCTION get_available_rooms(
+    start_date date,
+    end_date date,
+    filter_hotel_id int DEFAULT NULL,
+    filter_chain_name text DEFAULT NULL,
+    filter_min_stars int DEFAULT NULL,
+    filter_min_num_rooms int DEFAULT NULL,
+    filter_country text DEFAULT NULL,
+    filter_province_or_state text DEFAULT NULL,
+    filter_city text DEFAULT NULL,
+    filter_capacity int DEFAULT NULL,
+    filter_max_price numeric DEFAULT NULL
+) RETURNS TABLE (
+    chain_name text,
+    stars int,
+    num_rooms int,
+    country text,
+    province_or_state text,
+    city text,
+    address text,
+    room_number text,
+    capacity int,
+    description text,
+    price numeric,
+    hotel_id int
+) AS $get_available_rooms$
+    SELECT chains.chain_name,
+        hotels.stars,
+        hotels.num_rooms,
+        hotels.country,
+        hotels.province_or_state,
+        hotels.city,
+        CONCAT(hotels.street_number, ' ', hotels.street_name, ', ', hotels.zip) AS address,
+        rooms.room_number,
+        rooms.capacity,
+        view_types.description,
+        rooms.price,
+        hotels.hotel_id
+    FROM rooms
+    JOIN hotels
+    ON rooms.hotel_id = hotels.hotel_id
+    JOIN chains
+    ON hotels.chain_id = chains.chain_id
+    JOIN view_types
+    ON rooms.view_type = view_types.id
+    WHERE (filter_hotel_id IS NULL OR rooms.hotel_id = filter_hotel_id)
+        AND (filter_chain_name IS NULL OR chains.chain_name = filter_chain_name)
+        AND (filter_min_stars IS NULL OR hotels.stars >= filter_min_stars)
+        AND (filter_min_num_rooms IS NULL OR hotels.num_rooms >= filter_min_num_rooms)
+        AND (filter_country IS NULL OR hotels.country = filter_country)
+        AND (filter_province_or_state IS NULL OR hotels.province_or_state = filter_province_or_state)
+        AND (filter_city IS NULL OR hotels.city = filter_city)
+        AND (filter_capacity IS NULL OR rooms.capacity = filter_capacity)
+        AND (filter_max_price IS NULL OR rooms.price <= filter_max_price)
+        -- No booking of the room overlaps the requested stay
+        AND NOT EXISTS (
+            SELECT 1
+            FROM bookings
+            WHERE bookings.hotel_id = rooms.hotel_id
+                AND bookings.room_number = rooms.room_number
+                AND daterange(bookings.start_date, bookings.end_date)
+                    && daterange(get_available_rooms.start_date, get_available_rooms.end_date)
+        )
+    ORDER BY chains.chain_name, hotels.hotel_id, rooms.room_number;
+$get_available_rooms$ LANGUAGE sql STABLE;
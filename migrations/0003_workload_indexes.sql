@@ -0,0 +1,62 @@
+-- migrate: no-transaction
+-- Built CONCURRENTLY so bookings and rooms stay writable while the indexes
+-- build. If a build fails it leaves an INVALID index behind: drop it and run
+-- the migration again.
+
+-- customers.ssn and employees.ssn (login) are covered by their UNIQUE
+-- constraints, and bookings(hotel_id, room_number) by bookings_no_overlap.
+
+-- /bookings/ pages in (start_date, booking_id) order; replaces
+-- idx_bookings_start_date
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_bookings_start_date_booking_id
+ON bookings(start_date, booking_id);
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_bookings_start_date;
+
+-- Bookings search join and ON DELETE CASCADE from customers
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_bookings_customer_id
+ON bookings(customer_id);
+
+-- LEFT JOIN in bookings() and the paid amount lookup in rent()
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_rentals_booking_id
+ON rentals(booking_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_rentals_customer_id
+ON rentals(customer_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_rentals_room
+ON rentals(hotel_id, room_number);
+
+-- /hotels/<chain_id> and the chain -> hotels joins
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_hotels_chain_id
+ON hotels(chain_id);
+
+-- /rooms/ location filters; INCLUDE lets the remaining hotel filters be
+-- checked from the index
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_hotels_location
+ON hotels(country, province_or_state, city)
+INCLUDE (stars, num_rooms, chain_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_employees_hotel_id
+ON employees(hotel_id);
+
+-- /rooms/ capacity and max price filters
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_rooms_capacity_price
+ON rooms(capacity, price)
+INCLUDE (hotel_id, room_number);
+
+-- ON DELETE CASCADE from chains and hotels
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chain_offices_chain_id
+ON chain_offices(chain_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chain_phone_numbers_chain_id
+ON chain_phone_numbers(chain_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chain_email_addresses_chain_id
+ON chain_email_addresses(chain_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_hotel_phone_numbers_hotel_id
+ON hotel_phone_numbers(hotel_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_hotel_email_addresses_hotel_id
+ON hotel_email_addresses(hotel_id);
@@ -0,0 +1,14 @@
+-- migrate: no-transaction
+-- Trigram indexes for the /bookings/ name search and /customers/search.
+-- They serve substring (ILIKE '%x%'), fuzzy (%, <%) and prefix matches,
+-- none of which a btree index can answer without a full scan.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_customers_first_name_trgm
+ON customers USING gin (first_name gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_customers_last_name_trgm
+ON customers USING gin (last_name gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_customers_full_name_trgm
+ON customers USING gin ((first_name || ' ' || last_name) gin_trgm_ops);
@@ -0,0 +1,200 @@
+-- Daily occupancy and room revenue per hotel, the base of the occupancy,
+-- ADR and RevPAR reports. A night is occupied by a rental, or by a booking
+-- that has not been checked in (priced at the room's rate). A rental's
+-- paid_amount is spread evenly over its nights.
+CREATE TABLE IF NOT EXISTS daily_hotel_stats (
+    hotel_id INTEGER,
+    day DATE,
+    -- Rooms of the hotel when the day was last computed
+    num_rooms INTEGER NOT NULL,
+    occupied_rooms INTEGER NOT NULL,
+    revenue NUMERIC(12, 2) NOT NULL,
+    PRIMARY KEY (hotel_id, day),
+    FOREIGN KEY (hotel_id) REFERENCES hotels (hotel_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_daily_hotel_stats_day
+ON daily_hotel_stats(day) INCLUDE (num_rooms, occupied_rooms, revenue);
+
+
+-- Days of a hotel whose stats are out of date, [start_date, end_date)
+CREATE TABLE IF NOT EXISTS daily_hotel_stats_queue (
+    hotel_id INTEGER NOT NULL,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL
+);
+
+
+-- queue_daily_hotel_stats trigger
+-- Statement-level, like the counter triggers: a bulk insert queues one range
+-- per hotel instead of one per row.
+CREATE OR REPLACE FUNCTION queue_daily_hotel_stats() RETURNS TRIGGER AS $queue_daily_hotel_stats$
+    BEGIN
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO daily_hotel_stats_queue (hotel_id, start_date, end_date)
+            SELECT hotel_id, MIN(start_date), MAX(GREATEST(end_date, start_date + 1))
+            FROM new_stays
+            WHERE hotel_id IS NOT NULL
+                AND start_date IS NOT NULL
+                AND end_date IS NOT NULL
+            GROUP BY hotel_id;
+        END IF;
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            INSERT INTO daily_hotel_stats_queue (hotel_id, start_date, end_date)
+            SELECT hotel_id, MIN(start_date), MAX(GREATEST(end_date, start_date + 1))
+            FROM old_stays
+            WHERE hotel_id IS NOT NULL
+                AND start_date IS NOT NULL
+                AND end_date IS NOT NULL
+            GROUP BY hotel_id;
+        END IF;
+        RETURN NULL;
+    END;
+$queue_daily_hotel_stats$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trig_bookings_stats_insert
+    AFTER INSERT ON bookings
+    REFERENCING NEW TABLE AS new_stays
+    FOR EACH STATEMENT
+    EXECUTE PROCEDURE queue_daily_hotel_stats();
+
+CREATE OR REPLACE TRIGGER trig_bookings_stats_update
+    AFTER UPDATE ON bookings
+    REFERENCING OLD TABLE AS old_stays NEW TABLE AS new_stays
+    FOR EACH STATEMENT
+    EXECUTE PROCEDURE queue_daily_hotel_stats();
+
+CREATE OR REPLACE TRIGGER trig_bookings_stats_delete
+    AFTER DELETE ON bookings
+    REFERENCING OLD TABLE AS old_stays
+    FOR EACH STATEMENT
+    EXECUTE PROCEDURE queue_daily_hotel_stats();
+
+CREATE OR REPLACE TRIGGER trig_rentals_stats_insert
+    AFTER INSERT ON rentals
+    REFERENCING NEW TABLE AS new_stays
+    FOR EACH STATEMENT
+    EXECUTE PROCEDURE queue_daily_hotel_stats();
+
+CREATE OR REPLACE TRIGGER trig_rentals_stats_update
+    AFTER UPDATE ON rentals
+    REFERENCING OLD TABLE AS old_stays NEW TABLE AS new_stays
+    FOR EACH STATEMENT
+    EXECUTE PROCEDURE queue_daily_hotel_stats();
+
+CREATE OR REPLACE TRIGGER trig_rentals_stats_delete
+    AFTER DELETE ON rentals
+    REFERENCING OLD TABLE AS old_stays
+    FOR EACH STATEMENT
+    EXECUTE PROCEDURE queue_daily_hotel_stats();
+
+
+-- refresh_daily_hotel_stats function
+-- Recomputes the queued days and empties the queue; ranges queued while it
+-- runs wait for the next call. Each stay overlapping a queued range is
+-- expanded into its nights with generate_series, and every queued day gets a
+-- row, even if no room was occupied. Returns the number of days computed.
+CREATE OR REPLACE FUNCTION refresh_daily_hotel_stats() RETURNS integer AS $refresh_daily_hotel_stats$
+    DECLARE
+        num_days integer;
+    BEGIN
+        WITH claimed AS (
+            DELETE FROM daily_hotel_stats_queue
+            RETURNING hotel_id, start_date, end_date
+        ),
+        days AS (
+            SELECT DISTINCT claimed.hotel_id, day::date AS day
+            FROM claimed,
+                generate_series(claimed.start_date, claimed.end_date - 1, interval '1 day') AS day
+        ),
+        stays AS (
+            SELECT rentals.hotel_id,
+                rentals.room_number,
+                rentals.start_date,
+                rentals.end_date,
+                COALESCE(rentals.paid_amount, 0)
+                    / (rentals.end_date - rentals.start_date) AS nightly_rate
+            FROM rentals
+            -- Stays of at least one night (also false if a date is NULL)
+            WHERE rentals.end_date > rentals.start_date
+                AND EXISTS (
+                    SELECT 1
+                    FROM claimed
+                    WHERE claimed.hotel_id = rentals.hotel_id
+                        AND daterange(claimed.start_date, claimed.end_date)
+                            && daterange(rentals.start_date, rentals.end_date)
+                )
+            UNION ALL
+            SELECT bookings.hotel_id,
+                bookings.room_number,
+                bookings.start_date,
+                bookings.end_date,
+                rooms.price
+            FROM bookings
+            JOIN rooms
+            ON bookings.hotel_id = rooms.hotel_id
+                AND bookings.room_number = rooms.room_number
+            WHERE NOT EXISTS (
+                    SELECT 1 FROM rentals WHERE rentals.booking_id = bookings.booking_id
+                )
+                AND EXISTS (
+                    SELECT 1
+                    FROM claimed
+                    WHERE claimed.hotel_id = bookings.hotel_id
+                        AND daterange(claimed.start_date, claimed.end_date)
+                            && daterange(bookings.start_date, bookings.end_date)
+                )
+        ),
+        nights AS (
+            SELECT stays.hotel_id,
+                night::date AS day,
+                COUNT(DISTINCT stays.room_number) AS occupied_rooms,
+                SUM(stays.nightly_rate) AS revenue
+            FROM stays,
+                generate_series(stays.start_date, stays.end_date - 1, interval '1 day') AS night
+            GROUP BY stays.hotel_id, night::date
+        ),
+        computed AS (
+            INSERT INTO daily_hotel_stats (hotel_id, day, num_rooms, occupied_rooms, revenue)
+            SELECT days.hotel_id,
+                days.day,
+                hotels.num_rooms,
+                COALESCE(nights.occupied_rooms, 0),
+                COALESCE(nights.revenue, 0)
+            FROM days
+            JOIN hotels
+            ON days.hotel_id = hotels.hotel_id
+            LEFT JOIN nights
+            ON nights.hotel_id = days.hotel_id
+                AND nights.day = days.day
+            ON CONFLICT (hotel_id, day) DO UPDATE
+            SET num_rooms = EXCLUDED.num_rooms,
+                occupied_rooms = EXCLUDED.occupied_rooms,
+                revenue = EXCLUDED.revenue
+            RETURNING 1
+        )
+        SELECT COUNT(*) INTO num_days FROM computed;
+
+        INSERT INTO view_refreshes (view_name, refreshed_at)
+        VALUES ('daily_hotel_stats', now())
+        ON CONFLICT (view_name) DO UPDATE
+        SET refreshed_at = EXCLUDED.refreshed_at;
+
+        RETURN num_days;
+    END;
+$refresh_daily_hotel_stats$ LANGUAGE plpgsql;
+
+
+-- Queue the whole history of every hotel; refreshed by the seed, or with
+-- `python manage.py refresh-rollups`
+INSERT INTO daily_hotel_stats_queue (hotel_id, start_date, end_date)
+SELECT hotel_id, MIN(start_date), MAX(GREATEST(end_date, start_date + 1))
+FROM (
+    SELECT hotel_id, start_date, end_date FROM bookings
+    UNION ALL
+    SELECT hotel_id, start_date, end_date FROM rentals
+) AS stays
+WHERE hotel_id IS NOT NULL
+    AND start_date IS NOT NULL
+    AND end_date IS NOT NULL
+GROUP BY hotel_id;
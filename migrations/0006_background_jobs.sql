@@ -0,0 +1,196 @@
+-- Last run of each background job (website/jobs.py). A job is due when it
+-- has not finished within its interval, whichever worker ran it.
+CREATE TABLE IF NOT EXISTS job_runs (
+    job_name TEXT PRIMARY KEY,
+    started_at TIMESTAMPTZ NOT NULL,
+    finished_at TIMESTAMPTZ NOT NULL,
+    seconds DOUBLE PRECISION NOT NULL,
+    -- What the job returned, or the error it failed with
+    result TEXT
+);
+
+
+-- Bookings and rentals that ended before the archival cutoff. No foreign
+-- keys: the history stays even if the customer, hotel or room is deleted.
+CREATE TABLE IF NOT EXISTS bookings_archive (
+    booking_id UUID,
+    customer_id INTEGER,
+    hotel_id INTEGER,
+    room_number TEXT,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (booking_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_bookings_archive_hotel_dates
+ON bookings_archive(hotel_id, start_date, end_date);
+
+CREATE TABLE IF NOT EXISTS rentals_archive (
+    rental_id UUID,
+    customer_id INTEGER,
+    booking_id UUID,
+    hotel_id INTEGER,
+    room_number TEXT,
+    start_date DATE,
+    end_date DATE,
+    paid_amount NUMERIC(8, 2),
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (rental_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_rentals_archive_hotel_dates
+ON rentals_archive(hotel_id, start_date, end_date);
+
+CREATE INDEX IF NOT EXISTS idx_rentals_archive_booking_id
+ON rentals_archive(booking_id);
+
+
+-- Every stay, live or archived, for reports over past periods
+CREATE OR REPLACE VIEW booking_history AS
+    SELECT booking_id, customer_id, hotel_id, room_number, start_date, end_date
+    FROM bookings
+    UNION ALL
+    SELECT booking_id, customer_id, hotel_id, room_number, start_date, end_date
+    FROM bookings_archive;
+
+CREATE OR REPLACE VIEW rental_history AS
+    SELECT rental_id, customer_id, booking_id, hotel_id, room_number, start_date, end_date, paid_amount
+    FROM rentals
+    UNION ALL
+    SELECT rental_id, customer_id, booking_id, hotel_id, room_number, start_date, end_date, paid_amount
+    FROM rentals_archive;
+
+
+-- archive_stays function
+-- Moves the rentals that ended before `cutoff`, then the bookings that ended
+-- before it and have no rental left in `rentals` (rentals.booking_id would
+-- be set to NULL otherwise). Returns the number of rows moved.
+CREATE OR REPLACE FUNCTION archive_stays(cutoff DATE) RETURNS integer AS $archive_stays$
+    DECLARE
+        num_rentals integer;
+        num_bookings integer;
+    BEGIN
+        WITH moved AS (
+            DELETE FROM rentals
+            WHERE end_date < cutoff
+            RETURNING rental_id, customer_id, booking_id, hotel_id, room_number, start_date, end_date, paid_amount
+        )
+        INSERT INTO rentals_archive
+        (rental_id, customer_id, booking_id, hotel_id, room_number, start_date, end_date, paid_amount)
+        SELECT * FROM moved;
+        GET DIAGNOSTICS num_rentals = ROW_COUNT;
+
+        WITH moved AS (
+            DELETE FROM bookings
+            WHERE end_date < cutoff
+                AND NOT EXISTS (
+                    SELECT 1 FROM rentals WHERE rentals.booking_id = bookings.booking_id
+                )
+            RETURNING booking_id, customer_id, hotel_id, room_number, start_date, end_date
+        )
+        INSERT INTO bookings_archive
+        (booking_id, customer_id, hotel_id, room_number, start_date, end_date)
+        SELECT * FROM moved;
+        GET DIAGNOSTICS num_bookings = ROW_COUNT;
+
+        RETURN num_rentals + num_bookings;
+    END;
+$archive_stays$ LANGUAGE plpgsql;
+
+
+-- refresh_daily_hotel_stats function
+-- Same as in 0005_occupancy_rollups.sql, but reading archived stays too:
+-- archiving queues the days it moves stays out of, and they must come out
+-- unchanged.
+CREATE OR REPLACE FUNCTION refresh_daily_hotel_stats() RETURNS integer AS $refresh_daily_hotel_stats$
+    DECLARE
+        num_days integer;
+    BEGIN
+        WITH claimed AS (
+            DELETE FROM daily_hotel_stats_queue
+            RETURNING hotel_id, start_date, end_date
+        ),
+        days AS (
+            SELECT DISTINCT claimed.hotel_id, day::date AS day
+            FROM claimed,
+                generate_series(claimed.start_date, claimed.end_date - 1, interval '1 day') AS day
+        ),
+        stays AS (
+            SELECT rental_history.hotel_id,
+                rental_history.room_number,
+                rental_history.start_date,
+                rental_history.end_date,
+                COALESCE(rental_history.paid_amount, 0)
+                    / (rental_history.end_date - rental_history.start_date) AS nightly_rate
+            FROM rental_history
+            -- Stays of at least one night (also false if a date is NULL)
+            WHERE rental_history.end_date > rental_history.start_date
+                AND EXISTS (
+                    SELECT 1
+                    FROM claimed
+                    WHERE claimed.hotel_id = rental_history.hotel_id
+                        AND daterange(claimed.start_date, claimed.end_date)
+                            && daterange(rental_history.start_date, rental_history.end_date)
+                )
+            UNION ALL
+            SELECT booking_history.hotel_id,
+                booking_history.room_number,
+                booking_history.start_date,
+                booking_history.end_date,
+                rooms.price
+            FROM booking_history
+            JOIN rooms
+            ON booking_history.hotel_id = rooms.hotel_id
+                AND booking_history.room_number = rooms.room_number
+            WHERE NOT EXISTS (
+                    SELECT 1
+                    FROM rental_history
+                    WHERE rental_history.booking_id = booking_history.booking_id
+                )
+                AND EXISTS (
+                    SELECT 1
+                    FROM claimed
+                    WHERE claimed.hotel_id = booking_history.hotel_id
+                        AND daterange(claimed.start_date, claimed.end_date)
+                            && daterange(booking_history.start_date, booking_history.end_date)
+                )
+        ),
+        nights AS (
+            SELECT stays.hotel_id,
+                night::date AS day,
+                COUNT(DISTINCT stays.room_number) AS occupied_rooms,
+                SUM(stays.nightly_rate) AS revenue
+            FROM stays,
+                generate_series(stays.start_date, stays.end_date - 1, interval '1 day') AS night
+            GROUP BY stays.hotel_id, night::date
+        ),
+        computed AS (
+            INSERT INTO daily_hotel_stats (hotel_id, day, num_rooms, occupied_rooms, revenue)
+            SELECT days.hotel_id,
+                days.day,
+                hotels.num_rooms,
+                COALESCE(nights.occupied_rooms, 0),
+                COALESCE(nights.revenue, 0)
+            FROM days
+            JOIN hotels
+            ON days.hotel_id = hotels.hotel_id
+            LEFT JOIN nights
+            ON nights.hotel_id = days.hotel_id
+                AND nights.day = days.day
+            ON CONFLICT (hotel_id, day) DO UPDATE
+            SET num_rooms = EXCLUDED.num_rooms,
+                occupied_rooms = EXCLUDED.occupied_rooms,
+                revenue = EXCLUDED.revenue
+            RETURNING 1
+        )
+        SELECT COUNT(*) INTO num_days FROM computed;
+
+        INSERT INTO view_refreshes (view_name, refreshed_at)
+        VALUES ('daily_hotel_stats', now())
+        ON CONFLICT (view_name) DO UPDATE
+        SET refreshed_at = EXCLUDED.refreshed_at;
+
+        RETURN num_days;
+    END;
+$refresh_daily_hotel_stats$ LANGUAGE plpgsql;
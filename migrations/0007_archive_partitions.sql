@@ -0,0 +1,201 @@
+-- Range-partition the archive by end_date, one partition per year.
+--
+-- The live bookings and rentals tables stay unpartitioned: bookings_no_overlap
+-- must see every booking of a room, and Postgres cannot enforce an exclusion
+-- constraint across date partitions (nor keep booking_id, the target of
+-- rentals.booking_id, unique on its own). They only hold stays that ended less
+-- than EHOTELS_ARCHIVE_AFTER_DAYS ago, so availability checks only ever read
+-- current and future stays; archive_stays moves the rest here.
+DROP VIEW IF EXISTS booking_history;
+DROP VIEW IF EXISTS rental_history;
+
+ALTER TABLE bookings_archive RENAME TO bookings_archive_unpartitioned;
+ALTER TABLE rentals_archive RENAME TO rentals_archive_unpartitioned;
+DROP INDEX idx_bookings_archive_hotel_dates;
+DROP INDEX idx_rentals_archive_hotel_dates;
+DROP INDEX idx_rentals_archive_booking_id;
+ALTER INDEX bookings_archive_pkey RENAME TO bookings_archive_unpartitioned_pkey;
+ALTER INDEX rentals_archive_pkey RENAME TO rentals_archive_unpartitioned_pkey;
+
+CREATE TABLE bookings_archive (
+    booking_id UUID,
+    customer_id INTEGER,
+    hotel_id INTEGER,
+    room_number TEXT,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    -- The partition key must be part of the primary key
+    PRIMARY KEY (booking_id, end_date)
+) PARTITION BY RANGE (end_date);
+
+CREATE INDEX idx_bookings_archive_hotel_dates
+ON bookings_archive(hotel_id, start_date, end_date);
+
+CREATE TABLE rentals_archive (
+    rental_id UUID,
+    customer_id INTEGER,
+    booking_id UUID,
+    hotel_id INTEGER,
+    room_number TEXT,
+    start_date DATE,
+    end_date DATE NOT NULL,
+    paid_amount NUMERIC(8, 2),
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (rental_id, end_date)
+) PARTITION BY RANGE (end_date);
+
+CREATE INDEX idx_rentals_archive_hotel_dates
+ON rentals_archive(hotel_id, start_date, end_date);
+
+CREATE INDEX idx_rentals_archive_booking_id
+ON rentals_archive(booking_id);
+
+-- Partitions past the retention period, detached by
+-- detach_archive_partitions(), until they are dumped and dropped
+CREATE SCHEMA IF NOT EXISTS detached_archive;
+
+
+-- create_archive_partitions function
+-- Creates the yearly partitions of bookings_archive and rentals_archive
+-- (bookings_archive_2024 holds the bookings that ended in 2024) for every
+-- year from first_day to last_day.
+CREATE OR REPLACE FUNCTION create_archive_partitions(first_day DATE, last_day DATE) RETURNS void AS $create_archive_partitions$
+    DECLARE
+        archive_year integer;
+        parent text;
+    BEGIN
+        IF first_day IS NULL OR last_day IS NULL THEN
+            RETURN;
+        END IF;
+        FOR archive_year IN extract(year FROM first_day)::integer .. extract(year FROM last_day)::integer LOOP
+            FOREACH parent IN ARRAY ARRAY['bookings_archive', 'rentals_archive'] LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                    parent || '_' || archive_year,
+                    parent,
+                    make_date(archive_year, 1, 1),
+                    make_date(archive_year + 1, 1, 1)
+                );
+            END LOOP;
+        END LOOP;
+    END;
+$create_archive_partitions$ LANGUAGE plpgsql;
+
+
+SELECT create_archive_partitions(MIN(end_date), MAX(end_date))
+FROM (
+    SELECT end_date FROM bookings_archive_unpartitioned
+    UNION ALL
+    SELECT end_date FROM rentals_archive_unpartitioned
+) AS archived;
+
+INSERT INTO bookings_archive SELECT * FROM bookings_archive_unpartitioned;
+INSERT INTO rentals_archive SELECT * FROM rentals_archive_unpartitioned;
+DROP TABLE bookings_archive_unpartitioned;
+DROP TABLE rentals_archive_unpartitioned;
+
+
+-- Every stay, live or archived, for reports over past periods. Conditions on
+-- end_date only read the archive partitions of the years they cover.
+CREATE OR REPLACE VIEW booking_history AS
+    SELECT booking_id, customer_id, hotel_id, room_number, start_date, end_date
+    FROM bookings
+    UNION ALL
+    SELECT booking_id, customer_id, hotel_id, room_number, start_date, end_date
+    FROM bookings_archive;
+
+CREATE OR REPLACE VIEW rental_history AS
+    SELECT rental_id, customer_id, booking_id, hotel_id, room_number, start_date, end_date, paid_amount
+    FROM rentals
+    UNION ALL
+    SELECT rental_id, customer_id, booking_id, hotel_id, room_number, start_date, end_date, paid_amount
+    FROM rentals_archive;
+
+
+-- archive_stays function
+-- As in 0006_background_jobs.sql, creating the partitions the moved stays
+-- need first.
+CREATE OR REPLACE FUNCTION archive_stays(cutoff DATE) RETURNS integer AS $archive_stays$
+    DECLARE
+        num_rentals integer;
+        num_bookings integer;
+    BEGIN
+        PERFORM create_archive_partitions(MIN(end_date), MAX(end_date))
+        FROM (
+            SELECT end_date FROM bookings WHERE end_date < cutoff
+            UNION ALL
+            SELECT end_date FROM rentals WHERE end_date < cutoff
+        ) AS ended;
+
+        WITH moved AS (
+            DELETE FROM rentals
+            WHERE end_date < cutoff
+            RETURNING rental_id, customer_id, booking_id, hotel_id, room_number, start_date, end_date, paid_amount
+        )
+        INSERT INTO rentals_archive
+        (rental_id, customer_id, booking_id, hotel_id, room_number, start_date, end_date, paid_amount)
+        SELECT * FROM moved;
+        GET DIAGNOSTICS num_rentals = ROW_COUNT;
+
+        WITH moved AS (
+            DELETE FROM bookings
+            WHERE end_date < cutoff
+                AND NOT EXISTS (
+                    SELECT 1 FROM rentals WHERE rentals.booking_id = bookings.booking_id
+                )
+            RETURNING booking_id, customer_id, hotel_id, room_number, start_date, end_date
+        )
+        INSERT INTO bookings_archive
+        (booking_id, customer_id, hotel_id, room_number, start_date, end_date)
+        SELECT * FROM moved;
+        GET DIAGNOSTICS num_bookings = ROW_COUNT;
+
+        RETURN num_rentals + num_bookings;
+    END;
+$archive_stays$ LANGUAGE plpgsql;
+
+
+-- detach_archive_partitions function
+-- Detaches the yearly archive partitions that end on or before `cutoff` and
+-- moves them to the detached_archive schema, out of booking_history and
+-- rental_history. Each one and its indexes get the time it was detached as
+-- a suffix (bookings_archive_2019_20260101120000), since a partition for the
+-- same year may be created and detached again. Rollups already computed for those days
+-- are kept. Returns the number of partitions detached.
+CREATE OR REPLACE FUNCTION detach_archive_partitions(cutoff DATE) RETURNS integer AS $detach_archive_partitions$
+    DECLARE
+        archived record;
+        suffix text;
+        index_name text;
+        num_detached integer := 0;
+    BEGIN
+        FOR archived IN
+            SELECT parent.relname AS parent_name, child.relname AS name
+            FROM pg_inherits
+            JOIN pg_class AS parent
+            ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class AS child
+            ON child.oid = pg_inherits.inhrelid
+            WHERE parent.oid IN ('bookings_archive'::regclass, 'rentals_archive'::regclass)
+                AND make_date(substring(child.relname FROM '_(\d{4})$')::integer + 1, 1, 1) <= cutoff
+        LOOP
+            suffix := '_' || to_char(clock_timestamp(), 'YYYYMMDDHH24MISS');
+            EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', archived.parent_name, archived.name);
+            -- Its indexes move along with it, so they are renamed too
+            FOR index_name IN
+                SELECT index_class.relname
+                FROM pg_index
+                JOIN pg_class AS index_class
+                ON index_class.oid = pg_index.indexrelid
+                WHERE pg_index.indrelid = archived.name::regclass
+            LOOP
+                EXECUTE format('ALTER INDEX %I RENAME TO %I', index_name, left(index_name, 63 - length(suffix)) || suffix);
+            END LOOP;
+            EXECUTE format('ALTER TABLE %I RENAME TO %I', archived.name, archived.name || suffix);
+            EXECUTE format('ALTER TABLE %I SET SCHEMA detached_archive', archived.name || suffix);
+            num_detached := num_detached + 1;
+        END LOOP;
+        RETURN num_detached;
+    END;
+$detach_archive_partitions$ LANGUAGE plpgsql;
@@ -0,0 +1,18 @@
+import os
+
+import psycopg2
+import pytest
+
+from website import create_app
+
+
+@pytest.fixture(scope="session")
+def app():
+    """The app on the database of EHOTELS_DB_HOST (or localhost); the tests
+    that use it are skipped when there is no database to connect to."""
+    try:
+        app = create_app(remote=bool(os.environ.get("EHOTELS_DB_HOST")))
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"No database: {e}")
+    app.testing = True
+    return app
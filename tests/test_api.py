@@ -0,0 +1,118 @@
+import pytest
+
+from website.api import parse_booking
+
+BOOKING = {
+    "customer_ssn": "123456789",
+    "hotel_id": 1,
+    "room_number": "101",
+    "start_date": "2030-01-01",
+    "end_date": "2030-01-03",
+}
+
+
+def employee(client):
+    with client.session_transaction() as session:
+        session["user"] = {"type": "employee", "id": 1}
+
+
+def test_valid_booking_is_parsed():
+    row, error = parse_booking(BOOKING)
+    assert error is None
+    assert row[1:4] == ("123456789", 1, "101")
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [
+        {"hotel_id": 2**31},
+        {"hotel_id": -(2**31) - 1},
+        {"customer_id": 99999999999},
+        {"customer_ssn": [1]},
+        {"customer_ssn": 123456789},
+        {"end_date": "2030-01-01"},
+    ],
+)
+def test_bad_booking_is_invalid(changes):
+    row, error = parse_booking(dict(BOOKING, **changes))
+    assert row is None and error
+
+
+def test_out_of_range_items_do_not_fail_the_batch(app):
+    client = app.test_client()
+    employee(client)
+    response = client.post(
+        "/api/bookings",
+        json=[
+            dict(BOOKING, hotel_id=99999999999),
+            dict(BOOKING, customer_ssn={"ssn": 1}),
+            # Reaches the database, but books nothing
+            dict(BOOKING, customer_ssn="no such customer"),
+        ],
+    )
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json["results"]] == [
+        "invalid"
+    ] * 3
+
+
+def test_api_requires_a_key_or_an_employee(app):
+    assert app.test_client().post("/api/bookings", json=[]).status_code == 401
+
+
+def test_check_in_reports_the_bookings_that_fail(app):
+    from website import db
+
+    with app.app_context():
+        cursor = db.cursor()
+        cursor.execute(
+            r"""SELECT bookings.booking_id
+                FROM bookings
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM rentals WHERE rentals.booking_id = bookings.booking_id
+                )
+                LIMIT 3
+            """
+        )
+        booking_ids = [row[0] for row in cursor.fetchall()]
+        if len(booking_ids) < 3:
+            pytest.skip("Needs 3 bookings without a rental")
+        # Makes the INSERT of one of the bookings fail with an IntegrityError
+        cursor.execute(
+            "ALTER TABLE rentals ADD CONSTRAINT test_paid_amount "
+            "CHECK (paid_amount <> 13.37) NOT VALID"
+        )
+        db.commit()
+
+    try:
+        client = app.test_client()
+        employee(client)
+        response = client.post(
+            "/api/rentals",
+            json=[
+                {"booking_id": booking_ids[0], "paid_amount": 10},
+                {"booking_id": booking_ids[1], "paid_amount": 13.37},
+                {"booking_id": "not a uuid", "paid_amount": 10},
+                {"booking_id": booking_ids[2], "paid_amount": 10},
+            ],
+        )
+    finally:
+        with app.app_context():
+            cursor = db.cursor()
+            cursor.execute("ALTER TABLE rentals DROP CONSTRAINT test_paid_amount")
+            db.commit()
+
+    assert response.status_code == 409
+    assert [result["status"] for result in response.json["results"]] == [
+        "not_inserted",
+        "error",
+        "invalid",
+        "not_inserted",
+    ]
+    with app.app_context():
+        cursor = db.cursor()
+        cursor.execute(
+            "SELECT count(*) FROM rentals WHERE booking_id = ANY(%s::uuid[])",
+            (booking_ids,),
+        )
+        assert cursor.fetchone()[0] == 0
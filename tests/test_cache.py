@@ -0,0 +1,22 @@
+from website import cache as cache_module
+from website.cache import TTLCache
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = TTLCache(60, max_entries=2)
+    cache.get("a", lambda: 1)
+    cache.get("b", lambda: 2)
+    cache.get("a", lambda: None)
+    cache.get_many(["c"], lambda keys: {"c": 3})
+    assert list(cache.entries) == ["a", "c"]
+
+
+def test_expired_entries_are_dropped(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = TTLCache(10)
+    cache.get_many(["a", "b"], lambda keys: {key: key for key in keys})
+    now[0] = 11.0
+    assert cache.get("a", lambda: "reloaded") == "reloaded"
+    assert cache.get_many(["b"], lambda keys: {}) == {}
+    assert list(cache.entries) == ["a"]
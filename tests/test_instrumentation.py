@@ -0,0 +1,102 @@
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+from psycopg2.extensions import adapt
+from psycopg2.extras import execute_values
+
+from website.instrumentation import normalize
+
+
+class RecordingCursor:
+    """Just enough of a cursor for execute_values, which mogrifies each row
+    itself and then executes the joined statement."""
+
+    connection = SimpleNamespace(encoding="UTF8")
+
+    def mogrify(self, template, args):
+        if isinstance(template, str):
+            template = template.encode()
+        return template % tuple(adapt(arg).getquoted() for arg in args)
+
+    def execute(self, query):
+        self.query = query
+
+
+def sent(query, rows, template):
+    cursor = RecordingCursor()
+    execute_values(cursor, query, rows, template=template, page_size=len(rows))
+    return cursor.query
+
+
+BOOKINGS = r"""WITH items (item, customer_ssn, hotel_id, room_number, start_date, end_date) AS (
+        VALUES %s
+    )
+    SELECT * FROM items
+"""
+BOOKING = "(%s, %s::int, %s::text, %s::int, %s::text, %s::date, %s::date)"
+
+RENTALS = r"""WITH items (item, booking_id, paid_amount) AS (VALUES %s)
+    SELECT * FROM items
+"""
+RENTAL = "(%s, %s::uuid, %s::numeric)"
+
+
+def test_batch_sizes_and_nulls_normalize_to_one_statement():
+    booking = (1, 123456789, "1", 101, None, date(2024, 1, 1), date(2024, 1, 3))
+    texts = {
+        normalize(sent(BOOKINGS, [booking], BOOKING)),
+        normalize(sent(BOOKINGS, [booking] * 3, BOOKING)),
+        normalize(
+            sent(
+                BOOKINGS,
+                [booking, (2, None, None, None, "101", None, date(2024, 2, 1))],
+                BOOKING,
+            )
+        ),
+    }
+    assert len(texts) == 1
+    assert "VALUES (...)" in texts.pop()
+
+
+def test_casts_and_negative_numbers_collapse():
+    rental = (1, "6f1c2a52-0b8e-4c67-9d43-2f5f0f7a6f11", Decimal("-12.50"))
+    texts = {
+        normalize(sent(RENTALS, [rental], RENTAL)),
+        normalize(sent(RENTALS, [rental, (2, None, None)] * 50, RENTAL)),
+    }
+    assert texts == {
+        "WITH items (item, booking_id, paid_amount) AS (VALUES (...)) "
+        "SELECT * FROM items"
+    }
+
+
+def test_other_parentheses_are_kept():
+    assert normalize("SELECT count(*) FROM rooms WHERE hotel_id = %s") == (
+        "SELECT count(*) FROM rooms WHERE hotel_id = ?"
+    )
+    assert normalize("SELECT get_available_rooms(%s, %s)") == (
+        "SELECT get_available_rooms(?, ?)"
+    )
+
+
+def test_prepared_statements_are_recorded_under_their_sql(app):
+    from flask import g
+
+    from website import db
+    from website.instrumentation import start_request
+    from website.query_builder import execute_prepared
+
+    sql = "SELECT room_number FROM rooms WHERE hotel_id = %s AND capacity >= %s"
+    with app.test_request_context("/"):
+        start_request()
+        cursor = db.cursor()
+        # The first call prepares the statement, the second one reuses it
+        execute_prepared(cursor, sql, (1, 2))
+        execute_prepared(cursor, sql, (2, 3))
+        cursor.close()
+        texts = [normalize(query) for query, _, _ in g.sql]
+    executes = [text for text in texts if not text.startswith("PREPARE")]
+    assert executes == [
+        "SELECT room_number FROM rooms WHERE hotel_id = ? AND capacity >= ?"
+    ] * 2
@@ -0,0 +1,40 @@
+import json
+from base64 import urlsafe_b64encode
+from datetime import date
+
+import pytest
+from flask import Flask
+from werkzeug.exceptions import BadRequest
+
+from website.pagination import page_after
+from website.query_builder import iso_date, uuid_text
+
+app = Flask(__name__)
+BOOKING_ID = "6f1c2a52-0b8e-4c67-9d43-2f5f0f7a6f11"
+
+
+def cursor(key):
+    return "/?after=" + urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def test_key_is_parsed():
+    with app.test_request_context(cursor(["2024-01-01", BOOKING_ID])):
+        assert page_after(iso_date, uuid_text) == [date(2024, 1, 1), BOOKING_ID]
+    with app.test_request_context("/"):
+        assert page_after(int) is None
+
+
+@pytest.mark.parametrize(
+    "key", [[], [1, 2], ["x"], [None], {"a": 1}, ["2024-01-01", "nope"]]
+)
+def test_bad_cursor_is_a_400(key):
+    types = (iso_date, uuid_text) if len(key) == 2 else (int,)
+    with app.test_request_context(cursor(key)):
+        with pytest.raises(BadRequest):
+            page_after(*types)
+
+
+def test_undecodable_cursor_is_a_400():
+    with app.test_request_context("/?after=%%%"):
+        with pytest.raises(BadRequest):
+            page_after(int)
@@ -0,0 +1,12 @@
+import pytest
+
+from website.query_builder import MAX_INTEGER, positive_int
+
+
+def test_positive_int_fits_an_integer_column():
+    assert positive_int("0") == 0
+    assert positive_int(str(MAX_INTEGER)) == MAX_INTEGER
+    for text in ("-1", str(MAX_INTEGER + 1), "99999999999", "x"):
+        with pytest.raises(ValueError):
+            positive_int(text)
+
@@ -0,0 +1,36 @@
+import pytest
+
+# Every field of the search form of /rooms/
+ROOM_SEARCH = dict.fromkeys(
+    (
+        "capacity",
+        "chain",
+        "city",
+        "country",
+        "end-date",
+        "num-rooms",
+        "price",
+        "province-or-state",
+        "stars",
+        "start-date",
+    ),
+    "",
+)
+
+
+@pytest.mark.parametrize(
+    "fields, message",
+    [
+        ({"start-date": "2030-01-01"}, "Both Start Date and End Date are required"),
+        ({"end-date": "2030-01-03"}, "Both Start Date and End Date are required"),
+        (
+            {"start-date": "2030-01-03", "end-date": "2030-01-01"},
+            "End Date must follow Start Date",
+        ),
+        ({"capacity": "99999999999"}, "Invalid capacity: 99999999999"),
+    ],
+)
+def test_bad_room_search_is_flashed(app, fields, message):
+    response = app.test_client().post("/rooms/", data=dict(ROOM_SEARCH, **fields))
+    assert response.status_code == 200
+    assert message in response.get_data(as_text=True)
@@ -1,16 +1,21 @@
 import os
 
-import psycopg2
 from flask import Flask
+from werkzeug.local import LocalProxy
+
+from .instrumentation import InstrumentedCursor, init_instrumentation
+from .pool import close_db, get_db, init_pool
 
 EHOTELS_DB_HOST = os.environ.get("EHOTELS_DB_HOST")
 EHOTELS_DB_USER = os.environ.get("EHOTELS_DB_USER")
 EHOTELS_DB_PASSWORD = os.environ.get("EHOTELS_DB_PASSWORD")
-db = None
+
+# Connection checked out of the pool for the current request
+db = LocalProxy(get_db)
 
 
 def create_app(remote=False):
-    global db, EHOTELS_DB_HOST
+    global EHOTELS_DB_HOST
 
     app = Flask(__name__)
     app.config["SECRET_KEY"] = "secret"
@@ -18,18 +23,23 @@ def create_app(remote=False):
     if not remote:
         EHOTELS_DB_HOST = "localhost"
 
-    db = psycopg2.connect(
+    init_pool(
         host=EHOTELS_DB_HOST,
-        port=5432,
-        dbname="ehotels",
         user=EHOTELS_DB_USER,
         password=EHOTELS_DB_PASSWORD,
+        cursor_factory=InstrumentedCursor,
     )
+    app.teardown_appcontext(close_db)
+    init_instrumentation(app)
 
+    from .api import api
     from .auth import auth
+    from .metrics import metrics
     from .views import views
 
     app.register_blueprint(views, url_prefix="/")
     app.register_blueprint(auth, url_prefix="/")
+    app.register_blueprint(api, url_prefix="/api")
+    app.register_blueprint(metrics, url_prefix="/")
 
     return app
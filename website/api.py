@@ -0,0 +1,404 @@
+import hmac
+import os
+import traceback
+import uuid
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from flask import Blueprint, abort, jsonify, request, session
+from psycopg2.errors import IntegrityError
+from psycopg2.extras import execute_values
+
+from . import db
+from .availability import invalidate_calendar
+from .instrumentation import sql_stats
+from .metrics import increment
+from .query_builder import form_value, iso_date
+from .reports import default_period, occupancy_report, report_freshness
+
+EHOTELS_API_KEY = os.environ.get("EHOTELS_API_KEY")
+EHOTELS_API_MAX_BATCH = int(os.environ.get("EHOTELS_API_MAX_BATCH", 1000))
+# rentals.paid_amount is NUMERIC(8, 2)
+MAX_PAID_AMOUNT = Decimal("999999.99")
+# (item, booking_id, paid_amount) of each check-in of /api/rentals
+CHECK_IN_TEMPLATE = "(%s, %s::uuid, %s::numeric)"
+# Range of the INTEGER ids
+MIN_ID = -(2**31)
+MAX_ID = 2**31 - 1
+
+api = Blueprint("api", __name__)
+
+
+@api.before_request
+def check_api_key():
+    """Every endpoint needs the API key or an employee session. Without
+    EHOTELS_API_KEY only employees are let in."""
+    if EHOTELS_API_KEY and hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {EHOTELS_API_KEY}"
+    ):
+        return
+    user = session.get("user")
+    if user is None or user.get("type") != "employee":
+        abort(401)
+
+
+def parse_booking(item):
+    """Return (row, error) for one booking request of the batch."""
+    if not isinstance(item, dict):
+        return None, "Expected an object"
+    if item.get("customer_id") is None and item.get("customer_ssn") is None:
+        return None, "customer_id or customer_ssn is required"
+    if item.get("hotel_id") is None or item.get("room_number") is None:
+        return None, "hotel_id and room_number are required"
+    try:
+        hotel_id = int(item.get("hotel_id"))
+        customer_id = (
+            int(item.get("customer_id"))
+            if item.get("customer_id") is not None
+            else None
+        )
+    except (TypeError, ValueError):
+        return None, "hotel_id and customer_id must be integers"
+    if not MIN_ID <= hotel_id <= MAX_ID or not MIN_ID <= (customer_id or 0) <= MAX_ID:
+        return None, "hotel_id and customer_id are out of range"
+    if item.get("customer_ssn") is not None and not isinstance(
+        item.get("customer_ssn"), str
+    ):
+        return None, "customer_ssn must be a string"
+    try:
+        start_date = date.fromisoformat(item.get("start_date"))
+        end_date = date.fromisoformat(item.get("end_date"))
+    except (TypeError, ValueError):
+        return None, "start_date and end_date must be YYYY-MM-DD"
+    if end_date <= start_date:
+        return None, "End Date must follow Start Date"
+
+    return (
+        customer_id,
+        item.get("customer_ssn"),
+        hotel_id,
+        str(item.get("room_number")),
+        start_date,
+        end_date,
+    ), None
+
+
+@api.route("/bookings", methods=["POST"])
+def book_rooms():
+    """Book a batch of rooms in one statement.
+
+    Takes a JSON list of {customer_id or customer_ssn, hotel_id, room_number,
+    start_date, end_date} and returns one result per item, in order, with a
+    status of "booked", "conflict" (overlaps an existing booking or an
+    earlier item of the batch) or "invalid".
+    """
+    items = request.get_json(silent=True)
+    if not isinstance(items, list):
+        return jsonify(error="Expected a JSON list of bookings"), 400
+    if len(items) > EHOTELS_API_MAX_BATCH:
+        return (
+            jsonify(error=f"At most {EHOTELS_API_MAX_BATCH} bookings per request"),
+            413,
+        )
+
+    results = [None] * len(items)
+    rows = []
+    for i, item in enumerate(items):
+        row, error = parse_booking(item)
+        if error is not None:
+            results[i] = {"status": "invalid", "error": error}
+        else:
+            rows.append((i,) + row)
+
+    if rows:
+        # Overlaps are rejected by the bookings_no_overlap exclusion
+        # constraint; DO NOTHING skips them instead of failing the batch.
+        # Items are inserted in request order, so within a batch the first
+        # of two overlapping requests wins.
+        query = r"""WITH items (item, customer_id, customer_ssn, hotel_id, room_number, start_date, end_date) AS (
+                        VALUES %s
+                    ),
+                    resolved AS (
+                        SELECT items.item,
+                            customers.customer_id,
+                            items.hotel_id,
+                            items.room_number,
+                            items.start_date,
+                            items.end_date
+                        FROM items
+                        JOIN customers
+                        ON customers.customer_id = items.customer_id
+                            OR (
+                                items.customer_id IS NULL
+                                AND customers.ssn = items.customer_ssn
+                            )
+                        JOIN rooms
+                        ON rooms.hotel_id = items.hotel_id
+                            AND rooms.room_number = items.room_number
+                    ),
+                    inserted AS (
+                        INSERT INTO bookings (customer_id, hotel_id, room_number, start_date, end_date)
+                        SELECT customer_id, hotel_id, room_number, start_date, end_date
+                        FROM resolved
+                        ORDER BY item
+                        ON CONFLICT ON CONSTRAINT bookings_no_overlap DO NOTHING
+                        RETURNING booking_id, customer_id, hotel_id, room_number, start_date, end_date
+                    )
+                    SELECT items.item,
+                        resolved.item IS NOT NULL AS resolved,
+                        inserted.booking_id
+                    FROM items
+                    LEFT JOIN resolved
+                    ON resolved.item = items.item
+                    LEFT JOIN inserted
+                    ON inserted.customer_id = resolved.customer_id
+                        AND inserted.hotel_id = resolved.hotel_id
+                        AND inserted.room_number = resolved.room_number
+                        AND inserted.start_date = resolved.start_date
+                        AND inserted.end_date = resolved.end_date
+                        -- Identical requests: only the first one was inserted
+                        AND resolved.item = (
+                            SELECT MIN(duplicate.item)
+                            FROM resolved AS duplicate
+                            WHERE duplicate.customer_id = resolved.customer_id
+                                AND duplicate.hotel_id = resolved.hotel_id
+                                AND duplicate.room_number = resolved.room_number
+                                AND duplicate.start_date = resolved.start_date
+                                AND duplicate.end_date = resolved.end_date
+                        )
+                """
+        cursor = db.cursor()
+        execute_values(
+            cursor,
+            query,
+            rows,
+            template="(%s, %s::int, %s::text, %s::int, %s::text, %s::date, %s::date)",
+            page_size=len(rows),
+        )
+        conflicts = 0
+        booked = []
+        for item, resolved, booking_id in cursor.fetchall():
+            if booking_id is not None:
+                results[item] = {"status": "booked", "booking_id": booking_id}
+                booked.append(item)
+            elif resolved:
+                conflicts += 1
+                results[item] = {
+                    "status": "conflict",
+                    "error": "Room is already booked",
+                }
+            else:
+                results[item] = {
+                    "status": "invalid",
+                    "error": "Unknown customer or room",
+                }
+        db.commit()
+        cursor.close()
+        if conflicts:
+            increment("booking_conflicts", conflicts)
+        rows_by_item = {row[0]: row for row in rows}
+        for item in booked:
+            _, _, _, hotel_id, _, start_date, end_date = rows_by_item[item]
+            invalidate_calendar(hotel_id, start_date, end_date)
+
+    return jsonify(results=results)
+
+
+def parse_check_in(item):
+    """Return (row, error) for one check-in request of the batch."""
+    if not isinstance(item, dict):
+        return None, "Expected an object"
+    try:
+        booking_id = str(uuid.UUID(str(item.get("booking_id"))))
+    except ValueError:
+        return None, "booking_id must be a UUID"
+    try:
+        paid_amount = Decimal(str(item.get("paid_amount"))).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        return None, "paid_amount must be a number"
+    if not paid_amount.is_finite() or not 0 <= paid_amount <= MAX_PAID_AMOUNT:
+        return None, f"paid_amount must be between 0 and {MAX_PAID_AMOUNT}"
+    return (booking_id, paid_amount), None
+
+
+def failing_check_ins(cursor, query, rows):
+    """Return the items of `rows` whose check-in raises an IntegrityError on
+    its own, or all of them if none does. Each one is tried in a savepoint,
+    in a transaction the caller must roll back."""
+    failed = set()
+    for row in rows:
+        cursor.execute("SAVEPOINT check_in")
+        try:
+            execute_values(cursor, query, [row], template=CHECK_IN_TEMPLATE)
+        except IntegrityError:
+            cursor.execute("ROLLBACK TO SAVEPOINT check_in")
+            failed.add(row[0])
+        else:
+            cursor.execute("RELEASE SAVEPOINT check_in")
+    return failed or {row[0] for row in rows}
+
+
+@api.route("/rentals", methods=["POST"])
+def check_in():
+    """Check in a batch of bookings in one transaction.
+
+    Takes a JSON list of {booking_id, paid_amount} and returns one result per
+    item, in order, with a status of "rented" (and its rental_id),
+    "already_rented" (the booking was checked in before, or earlier in the
+    batch) or "invalid". If the insert fails with an IntegrityError nothing is
+    checked in and the response is a 409, as /rent/ refuses a single rental:
+    the items that fail on their own get the status "error", the other valid
+    items "not_inserted".
+    """
+    items = request.get_json(silent=True)
+    if not isinstance(items, list):
+        return jsonify(error="Expected a JSON list of check-ins"), 400
+    if len(items) > EHOTELS_API_MAX_BATCH:
+        return (
+            jsonify(error=f"At most {EHOTELS_API_MAX_BATCH} check-ins per request"),
+            413,
+        )
+
+    results = [None] * len(items)
+    rows = []
+    # {booking_id: items checking it in, the first one is inserted}
+    by_booking = {}
+    for i, item in enumerate(items):
+        row, error = parse_check_in(item)
+        if error is not None:
+            results[i] = {"status": "invalid", "error": error}
+        else:
+            if row[0] not in by_booking:
+                rows.append((i,) + row)
+            by_booking.setdefault(row[0], []).append(i)
+
+    if not rows:
+        return jsonify(results=results)
+
+    # One INSERT for the whole batch. The customer, room and dates are copied
+    # from each booking, as in rent(), and bookings that already have a
+    # rental are reported instead of being rented again.
+    query = r"""WITH items (item, booking_id, paid_amount) AS (
+                    VALUES %s
+                ),
+                rented AS (
+                    SELECT DISTINCT ON (rentals.booking_id)
+                        rentals.booking_id,
+                        rentals.rental_id
+                    FROM rentals
+                    JOIN items
+                    ON rentals.booking_id = items.booking_id
+                ),
+                inserted AS (
+                    INSERT INTO rentals
+                    (customer_id, booking_id, hotel_id, room_number, start_date, end_date, paid_amount)
+                    SELECT bookings.customer_id,
+                        bookings.booking_id,
+                        bookings.hotel_id,
+                        bookings.room_number,
+                        bookings.start_date,
+                        bookings.end_date,
+                        items.paid_amount
+                    FROM items
+                    JOIN bookings
+                    ON bookings.booking_id = items.booking_id
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM rented WHERE rented.booking_id = items.booking_id
+                    )
+                    ORDER BY items.item
+                    RETURNING rental_id, booking_id, hotel_id, start_date, end_date
+                )
+                SELECT items.item,
+                    inserted.rental_id,
+                    rented.rental_id,
+                    inserted.hotel_id,
+                    inserted.start_date,
+                    inserted.end_date
+                FROM items
+                LEFT JOIN inserted
+                ON inserted.booking_id = items.booking_id
+                LEFT JOIN rented
+                ON rented.booking_id = items.booking_id
+            """
+    rows_by_item = {row[0]: row for row in rows}
+    cursor = db.cursor()
+    try:
+        execute_values(
+            cursor, query, rows, template=CHECK_IN_TEMPLATE, page_size=len(rows)
+        )
+        checked_in = cursor.fetchall()
+        db.commit()
+    except IntegrityError:
+        increment("rental_integrity_errors")
+        db.rollback()
+        traceback.print_exc()
+        failed = failing_check_ins(cursor, query, rows)
+        db.rollback()
+        cursor.close()
+        for item, booking_id, _ in rows:
+            for i in by_booking[booking_id]:
+                if item in failed:
+                    results[i] = {"status": "error", "error": "Unable to rent room"}
+                else:
+                    results[i] = {
+                        "status": "not_inserted",
+                        "error": "Another check-in of the batch failed",
+                    }
+        return jsonify(results=results), 409
+    cursor.close()
+
+    for item, rental_id, rented_id, hotel_id, start_date, end_date in checked_in:
+        first, *duplicates = by_booking[rows_by_item[item][1]]
+        if rental_id is not None:
+            results[first] = {"status": "rented", "rental_id": rental_id}
+            invalidate_calendar(hotel_id, start_date, end_date)
+        elif rented_id is not None:
+            results[first] = {"status": "already_rented", "rental_id": rented_id}
+        else:
+            results[first] = {"status": "invalid", "error": "Unknown booking"}
+        for i in duplicates:
+            if results[first]["status"] == "invalid":
+                results[i] = results[first]
+            else:
+                results[i] = {
+                    "status": "already_rented",
+                    "rental_id": rental_id or rented_id,
+                }
+    return jsonify(results=results)
+
+
+@api.route("/reports/occupancy")
+def get_occupancy_report():
+    """Occupancy, ADR and RevPAR over [start_date, end_date).
+
+    `group` is hotel, chain (default) or area, the period defaults to this
+    year, and `chain`, `country`, `province-or-state` and `city` narrow the
+    hotels included.
+    """
+    start_date, end_date = default_period()
+    try:
+        start_date = form_value(request.args, "start_date", iso_date) or start_date
+        end_date = form_value(request.args, "end_date", iso_date) or end_date
+        report = occupancy_report(
+            request.args.get("group", "chain"), start_date, end_date, request.args
+        )
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    refreshed_at, pending = report_freshness()
+    return jsonify(
+        start_date=start_date.isoformat(),
+        end_date=end_date.isoformat(),
+        refreshed_at=refreshed_at.isoformat() if refreshed_at else None,
+        pending_ranges=pending,
+        results=report,
+    )
+
+
+@api.route("/sql-stats")
+def get_sql_stats():
+    """Query counters per endpoint since the process started.
+
+    For each endpoint: requests, queries, db_time (seconds), rows, slow (over
+    EHOTELS_SLOW_QUERY_MS) and the same counters per normalized statement.
+    """
+    return jsonify(sql_stats())
@@ -0,0 +1,131 @@
+import os
+from datetime import date, timedelta
+
+from . import db
+from .cache import TTLCache
+
+EHOTELS_CALENDAR_TTL = int(os.environ.get("EHOTELS_CALENDAR_TTL", 60))
+EHOTELS_CALENDAR_CACHE_SIZE = int(os.environ.get("EHOTELS_CALENDAR_CACHE_SIZE", 5000))
+MAX_MONTHS = 12
+# Calendars can start at most this many years before or after this year
+MAX_YEARS_AWAY = 10
+
+# {(hotel_id, first day of month): {room_number: bitmap}}
+cache = TTLCache(EHOTELS_CALENDAR_TTL, EHOTELS_CALENDAR_CACHE_SIZE)
+
+# One character per night of the month and room: 1 if a booking or rental
+# covers it. Stays are [start_date, end_date), as in bookings_no_overlap, and
+# are expanded into their nights inside the window so they can be hash joined
+# to the room x night grid instead of range-checked against every cell.
+CALENDAR_QUERY = r"""WITH stays AS (
+                        SELECT room_number, start_date, end_date
+                        FROM bookings
+                        WHERE hotel_id = %(hotel_id)s
+                            AND daterange(start_date, end_date) && daterange(%(start_date)s, %(end_date)s)
+                        UNION ALL
+                        SELECT room_number, start_date, end_date
+                        FROM rentals
+                        WHERE hotel_id = %(hotel_id)s
+                            AND start_date IS NOT NULL
+                            AND end_date IS NOT NULL
+                            AND daterange(start_date, end_date) && daterange(%(start_date)s, %(end_date)s)
+                    ),
+                    nights AS (
+                        SELECT DISTINCT stays.room_number, night::date AS night
+                        FROM stays,
+                            generate_series(
+                                GREATEST(stays.start_date, %(start_date)s::date),
+                                LEAST(stays.end_date, %(end_date)s::date) - 1,
+                                interval '1 day'
+                            ) AS night
+                    )
+                    SELECT date_trunc('month', days.day)::date AS month,
+                        rooms.room_number,
+                        string_agg(
+                            CASE WHEN nights.night IS NULL THEN '0' ELSE '1' END,
+                            ''
+                            ORDER BY days.day
+                        )
+                    FROM rooms
+                    CROSS JOIN generate_series(
+                        %(start_date)s::date, %(end_date)s::date - 1, interval '1 day'
+                    ) AS days (day)
+                    LEFT JOIN nights
+                    ON nights.room_number = rooms.room_number
+                        AND nights.night = days.day::date
+                    WHERE rooms.hotel_id = %(hotel_id)s
+                    GROUP BY month, rooms.room_number
+                """
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def load_months(hotel_id, months):
+    """Compute the bitmaps of all `months` of a hotel in one query."""
+    start_date = min(months)
+    end_date = add_months(max(months), 1)
+
+    cursor = db.cursor()
+    cursor.execute(
+        CALENDAR_QUERY,
+        {"hotel_id": hotel_id, "start_date": start_date, "end_date": end_date},
+    )
+    calendars = {}
+    month = start_date
+    while month < end_date:
+        calendars[(hotel_id, month)] = {}
+        month = add_months(month, 1)
+    for month, room_number, bitmap in cursor.fetchall():
+        calendars[(hotel_id, month)][room_number] = bitmap
+    cursor.close()
+    return calendars
+
+
+def get_calendar(hotel_id, first_month, num_months):
+    """Return {room_number: bitmap} of a hotel for `num_months` months from
+    `first_month`, one character per night."""
+    months = [add_months(first_month, i) for i in range(num_months)]
+    calendars = cache.get_many(
+        [(hotel_id, month) for month in months],
+        lambda keys: load_months(hotel_id, [month for _, month in keys]),
+    )
+
+    rooms = {}
+    for month in months:
+        for room_number in calendars[(hotel_id, month)]:
+            rooms.setdefault(room_number, "")
+    for month in months:
+        days = (add_months(month, 1) - month).days
+        month_calendar = calendars[(hotel_id, month)]
+        for room_number in rooms:
+            rooms[room_number] += month_calendar.get(room_number, "0" * days)
+    return dict(sorted(rooms.items()))
+
+
+def to_runs(bitmap):
+    """Run-length encode the occupied nights of `bitmap` as [[offset, nights]]."""
+    runs = []
+    start = None
+    for offset, night in enumerate(bitmap + "0"):
+        if night == "1" and start is None:
+            start = offset
+        elif night == "0" and start is not None:
+            runs.append([start, offset - start])
+            start = None
+    return runs
+
+
+def invalidate_calendar(hotel_id, start_date, end_date):
+    """Drop the cached months of a hotel covered by [start_date, end_date)."""
+    if isinstance(start_date, str):
+        start_date = date.fromisoformat(start_date)
+    if isinstance(end_date, str):
+        end_date = date.fromisoformat(end_date)
+    month = start_date.replace(day=1)
+    last_night = max(start_date, end_date - timedelta(days=1))
+    while month <= last_night:
+        cache.invalidate((hotel_id, month))
+        month = add_months(month, 1)
@@ -0,0 +1,279 @@
+import csv
+
+from psycopg2 import DataError
+
+from . import db
+from .facets import invalidate_facets
+
+IMPORT_COLUMNS = {
+    "chains": ("chain_name",),
+    "hotels": (
+        "chain_name",
+        "street_number",
+        "street_name",
+        "city",
+        "province_or_state",
+        "country",
+        "zip",
+        "stars",
+    ),
+    "rooms": (
+        "hotel_id",
+        "room_number",
+        "capacity",
+        "price",
+        "view_type",
+        "extensible",
+        "tv",
+        "air_condition",
+        "fridge",
+    ),
+}
+
+# Dropped at the end of the import transaction, so concurrent imports do not
+# see each other's rows
+STAGING_TABLES = {
+    "chains": r"""CREATE TEMP TABLE staging_chains (
+                    chain_name TEXT
+                ) ON COMMIT DROP
+            """,
+    "hotels": r"""CREATE TEMP TABLE staging_hotels (
+                    chain_name TEXT,
+                    street_number TEXT,
+                    street_name TEXT,
+                    city TEXT,
+                    province_or_state TEXT,
+                    country TEXT,
+                    zip TEXT,
+                    stars INTEGER
+                ) ON COMMIT DROP
+            """,
+    "rooms": r"""CREATE TEMP TABLE staging_rooms (
+                    hotel_id INTEGER,
+                    room_number TEXT,
+                    capacity INTEGER,
+                    price NUMERIC(8, 2),
+                    view_type INTEGER,
+                    extensible BOOLEAN,
+                    tv BOOLEAN,
+                    air_condition BOOLEAN,
+                    fridge BOOLEAN
+                ) ON COMMIT DROP
+            """,
+}
+
+# (message, query counting the offending staging rows)
+VALIDATIONS = {
+    "chains": [
+        (
+            "chain_name is required",
+            r"""SELECT COUNT(*) FROM staging_chains
+                WHERE COALESCE(chain_name, '') = ''
+            """,
+        ),
+    ],
+    "hotels": [
+        (
+            "street_number, street_name, city, country and zip are required",
+            r"""SELECT COUNT(*) FROM staging_hotels
+                WHERE COALESCE(street_number, '') = ''
+                    OR COALESCE(street_name, '') = ''
+                    OR COALESCE(city, '') = ''
+                    OR COALESCE(country, '') = ''
+                    OR COALESCE(zip, '') = ''
+            """,
+        ),
+        (
+            "stars must be between 1 and 5",
+            r"""SELECT COUNT(*) FROM staging_hotels
+                WHERE stars NOT BETWEEN 1 AND 5
+            """,
+        ),
+        (
+            "chain_name must match exactly one chain",
+            r"""SELECT COUNT(*) FROM staging_hotels
+                WHERE (
+                    SELECT COUNT(*) FROM chains
+                    WHERE chains.chain_name = staging_hotels.chain_name
+                ) != 1
+            """,
+        ),
+    ],
+    "rooms": [
+        (
+            "hotel_id, room_number, capacity and price are required",
+            r"""SELECT COUNT(*) FROM staging_rooms
+                WHERE hotel_id IS NULL
+                    OR COALESCE(room_number, '') = ''
+                    OR capacity IS NULL
+                    OR price IS NULL
+            """,
+        ),
+        (
+            "capacity and price must be positive",
+            r"""SELECT COUNT(*) FROM staging_rooms
+                WHERE capacity <= 0 OR price <= 0
+            """,
+        ),
+        (
+            "hotel_id does not exist",
+            r"""SELECT COUNT(*) FROM staging_rooms
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM hotels
+                    WHERE hotels.hotel_id = staging_rooms.hotel_id
+                )
+            """,
+        ),
+        (
+            "view_type does not exist",
+            r"""SELECT COUNT(*) FROM staging_rooms
+                WHERE view_type IS NOT NULL
+                    AND NOT EXISTS (
+                        SELECT 1 FROM view_types
+                        WHERE view_types.id = staging_rooms.view_type
+                    )
+            """,
+        ),
+        (
+            "(hotel_id, room_number) appears more than once",
+            r"""SELECT COALESCE(SUM(n - 1), 0) FROM (
+                    SELECT COUNT(*) AS n FROM staging_rooms
+                    GROUP BY hotel_id, room_number
+                    HAVING COUNT(*) > 1
+                ) AS duplicates
+            """,
+        ),
+    ],
+}
+
+# One INSERT ... SELECT per batch, so the statement-level num_hotels and
+# num_rooms triggers update each counter once for the whole file
+MERGES = {
+    "chains": r"""INSERT INTO chains (chain_name)
+                    SELECT DISTINCT staging_chains.chain_name
+                    FROM staging_chains
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM chains
+                        WHERE chains.chain_name = staging_chains.chain_name
+                    )
+            """,
+    "hotels": r"""INSERT INTO hotels
+                    (street_number, street_name, city, province_or_state, country, zip, stars, chain_id)
+                    SELECT DISTINCT s.street_number,
+                        s.street_name,
+                        s.city,
+                        s.province_or_state,
+                        s.country,
+                        s.zip,
+                        s.stars,
+                        chains.chain_id
+                    FROM staging_hotels AS s
+                    JOIN chains
+                    ON chains.chain_name = s.chain_name
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM hotels
+                        WHERE hotels.chain_id = chains.chain_id
+                            AND hotels.street_number = s.street_number
+                            AND hotels.street_name = s.street_name
+                            AND hotels.zip = s.zip
+                    )
+            """,
+    "rooms": r"""INSERT INTO rooms
+                    (hotel_id, room_number, capacity, price, view_type, extensible, tv, air_condition, fridge)
+                    SELECT hotel_id, room_number, capacity, price, view_type, extensible, tv, air_condition, fridge
+                    FROM staging_rooms
+                    ON CONFLICT (hotel_id, room_number) DO UPDATE
+                    SET capacity = EXCLUDED.capacity,
+                        price = EXCLUDED.price,
+                        view_type = EXCLUDED.view_type,
+                        extensible = EXCLUDED.extensible,
+                        tv = EXCLUDED.tv,
+                        air_condition = EXCLUDED.air_condition,
+                        fridge = EXCLUDED.fridge
+            """,
+}
+
+
+def copy_csv(cursor, kind, file):
+    header = file.readline()
+    if isinstance(header, bytes):
+        header = header.decode("utf-8-sig")
+    columns = [column.strip() for column in next(csv.reader([header]), [])]
+
+    unknown = [column for column in columns if column not in IMPORT_COLUMNS[kind]]
+    if not columns or unknown:
+        return [
+            "Unknown columns in header: "
+            + ", ".join(unknown or ["(empty)"])
+            + ". Expected some of: "
+            + ", ".join(IMPORT_COLUMNS[kind])
+        ]
+
+    # Columns are checked against IMPORT_COLUMNS above
+    cursor.copy_expert(
+        f"COPY staging_{kind} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+        file,
+    )
+    return []
+
+
+def copy_json(cursor, kind, file):
+    # One JSON object per line. Each line is loaded whole into a jsonb column:
+    # control characters as CSV delimiter and quote keep COPY from splitting
+    # or unescaping it
+    cursor.execute("CREATE TEMP TABLE staging_json (doc JSONB) ON COMMIT DROP")
+    cursor.copy_expert(
+        r"""COPY staging_json (doc) FROM STDIN
+            WITH (FORMAT csv, DELIMITER E'\x01', QUOTE E'\x02')
+        """,
+        file,
+    )
+    cursor.execute(
+        f"""INSERT INTO staging_{kind}
+            SELECT record.*
+            FROM staging_json,
+                jsonb_populate_record(NULL::staging_{kind}, staging_json.doc) AS record
+            WHERE staging_json.doc IS NOT NULL
+        """
+    )
+    return []
+
+
+def import_file(kind, file, file_format="csv"):
+    """Bulk-load a CSV or JSON lines `file` of `kind` (chains, hotels, rooms).
+
+    Rows are streamed into a staging table with COPY, validated, and merged
+    in a single transaction. Returns (number of rows merged, errors); nothing
+    is merged if there are any errors.
+    """
+    if kind not in IMPORT_COLUMNS:
+        return 0, [f"Unknown import type {kind}"]
+
+    cursor = db.cursor()
+    try:
+        cursor.execute(STAGING_TABLES[kind])
+        if file_format == "json":
+            errors = copy_json(cursor, kind, file)
+        else:
+            errors = copy_csv(cursor, kind, file)
+
+        if not errors:
+            for message, query in VALIDATIONS[kind]:
+                cursor.execute(query)
+                count = cursor.fetchone()[0]
+                if count:
+                    errors.append(f"{count} row(s): {message}")
+    except DataError as e:
+        errors = [str(e).strip()]
+
+    if errors:
+        db.rollback()
+        cursor.close()
+        return 0, errors
+
+    cursor.execute(MERGES[kind])
+    merged = cursor.rowcount
+    db.commit()
+    cursor.close()
+    invalidate_facets()
+    return merged, []
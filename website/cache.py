@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe in-process cache whose entries expire after `ttl` seconds.
+
+    Each worker process has its own cache, so writes made through another
+    process are only picked up once the entry expires. With `max_entries`,
+    the least recently used entries are evicted beyond that many.
+    """
+
+    def __init__(self, ttl, max_entries=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # {key: (expires, value)}, least recently used first
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def lookup(self, key, now):
+        # Called with the lock held. Expired entries are dropped when they are
+        # looked up, those that never are again go out as least recently used
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def store(self, key, value, now):
+        # Called with the lock held
+        self.entries[key] = (now + self.ttl, value)
+        self.entries.move_to_end(key)
+        if self.max_entries is not None:
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get(self, key, loader):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.lookup(key, now)
+        if entry is not None:
+            return entry[1]
+
+        value = loader()
+        with self.lock:
+            self.store(key, value, now)
+        return value
+
+    def get_many(self, keys, loader):
+        """Return {key: value} for `keys`. The keys that are not cached are
+        loaded together with one call of `loader(missing keys)`, which must
+        return {key: value} (and may return extra keys, which are cached)."""
+        now = time.monotonic()
+        values = {}
+        with self.lock:
+            for key in keys:
+                entry = self.lookup(key, now)
+                if entry is not None:
+                    values[key] = entry[1]
+
+        missing = [key for key in keys if key not in values]
+        if missing:
+            loaded = loader(missing)
+            with self.lock:
+                for key, value in loaded.items():
+                    self.store(key, value, now)
+            values.update(loaded)
+        return values
+
+    def invalidate(self, key=None):
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
@@ -0,0 +1,62 @@
+import os
+
+from . import db
+
+EHOTELS_SEARCH_LIMIT = int(os.environ.get("EHOTELS_SEARCH_LIMIT", 10))
+
+# Customers whose full name contains the text, has a word close to it (pg_trgm
+# word similarity) or whose first or last name is close to it, so typos still
+# match. Prefix matches rank first, then by similarity. Each branch of the
+# WHERE clause is answered by one of the trigram indexes of 0003.
+SEARCH_QUERY = r"""SELECT customer_id,
+                        first_name,
+                        last_name,
+                        round(
+                            GREATEST(
+                                word_similarity(%(text)s, first_name || ' ' || last_name),
+                                similarity(%(text)s, first_name),
+                                similarity(%(text)s, last_name)
+                            )::numeric,
+                            3
+                        ) AS score
+                    FROM customers
+                    WHERE (first_name || ' ' || last_name) ILIKE '%%' || %(pattern)s || '%%'
+                        OR %(text)s <%% (first_name || ' ' || last_name)
+                        OR first_name %% %(text)s
+                        OR last_name %% %(text)s
+                    ORDER BY first_name ILIKE %(pattern)s || '%%'
+                            OR last_name ILIKE %(pattern)s || '%%' DESC,
+                        score DESC,
+                        last_name,
+                        first_name
+                    LIMIT %(limit)s
+                """
+
+
+def escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_customers(text, limit=EHOTELS_SEARCH_LIMIT):
+    """Return up to `limit` (customer_id, first_name, last_name, score) whose
+    name matches `text`, best first."""
+    text = " ".join(text.split())
+    if not text:
+        return []
+    cursor = db.cursor()
+    cursor.execute(
+        SEARCH_QUERY, {"text": text, "pattern": escape_like(text), "limit": limit}
+    )
+    customers = cursor.fetchall()
+    cursor.close()
+    return customers
+
+
+def name_condition(column):
+    """SQL matching `column` against a name typed in a search form: as a
+    substring, or fuzzily to tolerate typos. Takes (like pattern, text)."""
+    return f"({column} ILIKE %s OR {column} %% %s)"
+
+
+def name_params(text):
+    return (f"%{escape_like(text)}%", text)
@@ -0,0 +1,43 @@
+import os
+
+from . import db
+from .cache import TTLCache
+
+EHOTELS_FACET_TTL = int(os.environ.get("EHOTELS_FACET_TTL", 300))
+cache = TTLCache(EHOTELS_FACET_TTL)
+
+
+def load_facets():
+    query = r"""SELECT
+                    (SELECT array_agg(DISTINCT capacity ORDER BY capacity) FROM rooms),
+                    (SELECT array_agg(DISTINCT chain_name ORDER BY chain_name) FROM chains),
+                    (SELECT array_agg(DISTINCT country ORDER BY country) FROM hotels),
+                    (SELECT array_agg(DISTINCT province_or_state ORDER BY province_or_state) FROM hotels),
+                    (SELECT array_agg(DISTINCT city ORDER BY city) FROM hotels),
+                    (SELECT array_agg(DISTINCT stars ORDER BY stars) FROM hotels),
+                    (SELECT array_agg(DISTINCT num_rooms ORDER BY num_rooms) FROM hotels)
+            """
+    cursor = db.cursor()
+    cursor.execute(query)
+    row = [values or [] for values in cursor.fetchone()]
+    cursor.close()
+
+    capacities, chains, countries, provinces_or_states, cities, stars, num_rooms = row
+    return {
+        "capacities": capacities,
+        "chains": chains,
+        "countries": countries,
+        "provinces_or_states": provinces_or_states,
+        "cities": cities,
+        "stars": stars,
+        "num_rooms": num_rooms,
+        "max_num_rooms": max(num_rooms, default=0),
+    }
+
+
+def get_facets():
+    return cache.get("facets", load_facets)
+
+
+def invalidate_facets():
+    cache.invalidate("facets")
@@ -0,0 +1,160 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+
+from flask import g, has_request_context, request
+from psycopg2.extensions import cursor
+
+from .query_builder import prepared_sql
+
+EHOTELS_SLOW_QUERY_MS = float(os.environ.get("EHOTELS_SLOW_QUERY_MS", 100))
+
+logger = logging.getLogger(__name__)
+
+# {endpoint: {"requests", "queries", "db_time", "rows", "slow", "statements"}}
+# where "statements" is {fingerprint: {"text", "count", "time", "rows"}}
+stats = {}
+stats_lock = threading.Lock()
+
+
+def normalize(query):
+    """Return `query` with literals and parameters replaced by ?, so every
+    execution of the same statement has the same text."""
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    text = re.sub(r"'(?:[^']|'')*'", "?", query)
+    text = re.sub(r"%\(\w+\)s|%s", "?", text)
+    text = re.sub(r"\b\d+(?:\.\d+)?\b", "?", text)
+    # Rows of ?, NULL or casts of them such as ?::int, and VALUES lists of any
+    # number of them as sent by execute_values, so batch sizes and NULLs do not
+    # add new statements
+    item = r"\s*(?:-\s*)?(?:\?|NULL)(?:\s*::\s*\w+(?:\s*\[\])?)*\s*"
+    row = rf"\({item}(?:,{item})*\)"
+    text = re.sub(
+        rf"\bVALUES\s*{row}(?:\s*,\s*{row})*", "VALUES (...)", text, flags=re.I
+    )
+    text = re.sub(rf"{row}(?:\s*,\s*{row})+", "(...)", text)
+    return " ".join(text.split())
+
+
+def fingerprint(text):
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+def record(query, duration, rows):
+    duration_ms = duration * 1000
+    if duration_ms >= EHOTELS_SLOW_QUERY_MS:
+        logger.warning(
+            "Slow query (%.1f ms, %s rows) in %s: %s",
+            duration_ms,
+            rows,
+            request.endpoint if has_request_context() else None,
+            normalize(query),
+        )
+    if has_request_context() and "sql" in g:
+        g.sql.append((query, duration, rows))
+
+
+class InstrumentedCursor(cursor):
+    """Cursor that times each statement and records it for the current
+    request. Installed as the cursor_factory of every pooled connection.
+
+    EXECUTEs of prepared statements are recorded under the SQL they were
+    prepared from, not under their generated names."""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record(
+                prepared_sql(self.connection, query),
+                time.perf_counter() - start,
+                max(self.rowcount, 0),
+            )
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            record(query, time.perf_counter() - start, max(self.rowcount, 0))
+
+
+def start_request():
+    g.sql = []
+    g.request_start = time.perf_counter()
+
+
+def add_server_timing(response):
+    # Streamed responses run their remaining queries after this, so their
+    # header only covers the queries made before the first chunk
+    if "sql" in g:
+        db_ms = sum(duration for _, duration, _ in g.sql) * 1000
+        total_ms = (time.perf_counter() - g.request_start) * 1000
+        response.headers.add(
+            "Server-Timing", f'db;dur={db_ms:.2f};desc="{len(g.sql)} queries"'
+        )
+        response.headers.add("Server-Timing", f"app;dur={total_ms:.2f}")
+    return response
+
+
+def collect_request(exception=None):
+    queries = g.pop("sql", None)
+    if queries is None:
+        return
+
+    statements = []
+    for query, duration, rows in queries:
+        text = normalize(query)
+        statements.append((fingerprint(text), text, duration, rows))
+
+    with stats_lock:
+        endpoint = stats.setdefault(
+            request.endpoint or "unmatched",
+            {
+                "requests": 0,
+                "queries": 0,
+                "db_time": 0.0,
+                "rows": 0,
+                "slow": 0,
+                "statements": {},
+            },
+        )
+        endpoint["requests"] += 1
+        for key, text, duration, rows in statements:
+            endpoint["queries"] += 1
+            endpoint["db_time"] += duration
+            endpoint["rows"] += rows
+            if duration * 1000 >= EHOTELS_SLOW_QUERY_MS:
+                endpoint["slow"] += 1
+            statement = endpoint["statements"].setdefault(
+                key, {"text": text, "count": 0, "time": 0.0, "rows": 0}
+            )
+            statement["count"] += 1
+            statement["time"] += duration
+            statement["rows"] += rows
+
+
+def sql_stats():
+    """Return a copy of the per-endpoint query counters."""
+    with stats_lock:
+        return {
+            endpoint: dict(
+                counters,
+                statements={
+                    key: dict(statement)
+                    for key, statement in counters["statements"].items()
+                },
+            )
+            for endpoint, counters in stats.items()
+        }
+
+
+def init_instrumentation(app):
+    app.before_request(start_request)
+    app.after_request(add_server_timing)
+    app.teardown_request(collect_request)
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+import traceback
+from datetime import date, timedelta
+
+import psycopg2
+
+from . import pool as db_pool
+from .metrics import observe_job
+
+EHOTELS_JOBS = os.environ.get("EHOTELS_JOBS", "1") != "0"
+EHOTELS_JOB_POLL = int(os.environ.get("EHOTELS_JOB_POLL", 30))
+EHOTELS_VIEWS_INTERVAL = int(os.environ.get("EHOTELS_VIEWS_INTERVAL", 300))
+EHOTELS_ROLLUPS_INTERVAL = int(os.environ.get("EHOTELS_ROLLUPS_INTERVAL", 300))
+EHOTELS_ARCHIVE_INTERVAL = int(os.environ.get("EHOTELS_ARCHIVE_INTERVAL", 86400))
+EHOTELS_ARCHIVE_AFTER_DAYS = int(os.environ.get("EHOTELS_ARCHIVE_AFTER_DAYS", 90))
+EHOTELS_ARCHIVE_KEEP_YEARS = int(os.environ.get("EHOTELS_ARCHIVE_KEEP_YEARS", 5))
+
+# First key of the advisory locks of the jobs, the second is the job's name
+LOCK_NAMESPACE = 2132
+
+
+def refresh_views(cursor):
+    cursor.execute("SELECT refresh_available_rooms_per_area()")
+    return "refreshed available_rooms_per_area"
+
+
+def refresh_rollups(cursor):
+    cursor.execute("SELECT refresh_daily_hotel_stats()")
+    return f"refreshed {cursor.fetchone()[0]} days"
+
+
+def archive_stays(cursor):
+    cutoff = date.today() - timedelta(days=EHOTELS_ARCHIVE_AFTER_DAYS)
+    cursor.execute("SELECT archive_stays(%s)", (cutoff,))
+    result = f"archived {cursor.fetchone()[0]} stays ended before {cutoff}"
+    if EHOTELS_ARCHIVE_KEEP_YEARS > 0:
+        # Whole years only: the partitions are yearly
+        keep_from = date(date.today().year - EHOTELS_ARCHIVE_KEEP_YEARS, 1, 1)
+        cursor.execute("SELECT detach_archive_partitions(%s)", (keep_from,))
+        result += f", detached {cursor.fetchone()[0]} partitions ended by {keep_from}"
+    return result
+
+
+# {name: (interval in seconds, function)}; each function runs in its own
+# transaction and returns a short description of what it did
+JOBS = {
+    "refresh-views": (EHOTELS_VIEWS_INTERVAL, refresh_views),
+    "refresh-rollups": (EHOTELS_ROLLUPS_INTERVAL, refresh_rollups),
+    "archive-stays": (EHOTELS_ARCHIVE_INTERVAL, archive_stays),
+}
+
+
+def due_jobs(cursor):
+    """Names of the jobs that have not finished within their interval."""
+    cursor.execute(
+        r"""SELECT jobs.job_name
+            FROM unnest(%s::text[], %s::integer[]) AS jobs (job_name, seconds)
+            LEFT JOIN job_runs
+            ON job_runs.job_name = jobs.job_name
+            WHERE job_runs.finished_at IS NULL
+                OR job_runs.finished_at <= now() - make_interval(secs => jobs.seconds)
+        """,
+        (list(JOBS), [interval for interval, _ in JOBS.values()]),
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def record_run(cursor, name, started_at, seconds, result):
+    cursor.execute(
+        r"""INSERT INTO job_runs (job_name, started_at, finished_at, seconds, result)
+            VALUES (%s, %s, clock_timestamp(), %s, %s)
+            ON CONFLICT (job_name) DO UPDATE
+            SET started_at = EXCLUDED.started_at,
+                finished_at = EXCLUDED.finished_at,
+                seconds = EXCLUDED.seconds,
+                result = EXCLUDED.result
+        """,
+        (name, started_at, seconds, result),
+    )
+
+
+def run_job(conn, name):
+    """Run job `name` on `conn` if it is due and no other process is running
+    it. Returns "ok", "failed", or "skipped" if it was locked or not due."""
+    _, job = JOBS[name]
+    cursor = conn.cursor()
+    # The lock is held until the transaction ends, so it cannot outlive the
+    # job even if the connection goes back to the pool
+    cursor.execute(
+        "SELECT pg_try_advisory_xact_lock(%s, hashtext(%s)), now()",
+        (LOCK_NAMESPACE, name),
+    )
+    locked, started_at = cursor.fetchone()
+    # Another worker may have finished it since due_jobs()
+    if not locked or name not in due_jobs(cursor):
+        conn.rollback()
+        cursor.close()
+        observe_job(name, "skipped")
+        return "skipped"
+
+    start = time.perf_counter()
+    # A failed job is only rolled back to here, so the lock is still held
+    # while its failure is recorded
+    cursor.execute("SAVEPOINT job")
+    try:
+        result = job(cursor)
+        outcome = "ok"
+    except psycopg2.Error as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT job")
+        traceback.print_exc()
+        # Recorded as a run, so a failing job waits for its next interval
+        # instead of being retried at every poll
+        result = f"failed: {e}"
+        outcome = "failed"
+    record_run(cursor, name, started_at, time.perf_counter() - start, result)
+    conn.commit()
+    cursor.close()
+    observe_job(name, outcome, time.perf_counter() - start)
+    return outcome
+
+
+def run_due_jobs():
+    """Run every due job once, each in its own transaction. Returns
+    {name: outcome} of the jobs that were due."""
+    conn = db_pool.checkout()
+    try:
+        cursor = conn.cursor()
+        names = due_jobs(cursor)
+        cursor.close()
+        conn.rollback()
+        return {name: run_job(conn, name) for name in names}
+    finally:
+        db_pool.release(conn)
+
+
+def run_scheduler(stop):
+    """Poll for due jobs every EHOTELS_JOB_POLL seconds until `stop` is set."""
+    while not stop.is_set():
+        try:
+            run_due_jobs()
+        except Exception:
+            # Keep polling: the database may just be unreachable for now
+            traceback.print_exc()
+        stop.wait(EHOTELS_JOB_POLL)
+
+
+def start_scheduler():
+    """Start the scheduler in a daemon thread of this process, unless
+    EHOTELS_JOBS=0. Every server process can start one: the advisory locks
+    and job_runs make sure each job runs once per interval overall."""
+    if not EHOTELS_JOBS:
+        return None
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=run_scheduler, args=(stop,), name="ehotels-jobs", daemon=True
+    )
+    thread.start()
+    return stop
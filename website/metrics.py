@@ -0,0 +1,208 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Blueprint, Response, g, request
+
+from . import pool as db_pool
+from .instrumentation import sql_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+metrics = Blueprint("metrics", __name__)
+
+# Only held for a few integer additions per request; everything else
+# (bucket lookup, formatting) happens outside it
+lock = threading.Lock()
+in_flight = 0
+# {endpoint: [count per bucket..., count above the last bucket, sum]}
+latencies = {}
+# {(endpoint, method, status): count}
+responses = {}
+# {(event, endpoint): count}
+events = {}
+# {(job, outcome): count}
+job_runs = {}
+# {job: [seconds spent in runs that were not skipped, unix time of the last
+# successful run]}
+job_times = {}
+
+EVENTS = {
+    "booking_conflicts": "Bookings rejected because the room was already booked",
+    "rental_integrity_errors": "Rentals rejected by an IntegrityError",
+}
+
+
+def endpoint_label():
+    # Unmatched URLs share one label so 404s cannot grow the series
+    return request.endpoint or "unmatched"
+
+
+def increment(event, amount=1):
+    """Count `amount` occurrences of `event` (see EVENTS) for this endpoint."""
+    key = (event, endpoint_label())
+    with lock:
+        events[key] = events.get(key, 0) + amount
+
+
+def observe_job(job, outcome, duration=None):
+    """Count a run of background job `job` ("ok", "failed" or "skipped")
+    that took `duration` seconds."""
+    with lock:
+        job_runs[(job, outcome)] = job_runs.get((job, outcome), 0) + 1
+        if duration is not None:
+            times = job_times.setdefault(job, [0.0, None])
+            times[0] += duration
+            if outcome == "ok":
+                times[1] = time.time()
+
+
+@metrics.before_app_request
+def start_timer():
+    global in_flight
+
+    g.metrics_start = time.perf_counter()
+    with lock:
+        in_flight += 1
+
+
+@metrics.after_app_request
+def count_response(response):
+    key = (endpoint_label(), request.method, response.status_code)
+    with lock:
+        responses[key] = responses.get(key, 0) + 1
+    return response
+
+
+@metrics.teardown_app_request
+def observe_latency(exception=None):
+    global in_flight
+
+    start = g.pop("metrics_start", None)
+    if start is None:
+        return
+    # Teardown runs after a streamed body is sent, so this is the full time
+    duration = time.perf_counter() - start
+    bucket = bisect_left(LATENCY_BUCKETS, duration)
+    endpoint = endpoint_label()
+    with lock:
+        in_flight -= 1
+        histogram = latencies.get(endpoint)
+        if histogram is None:
+            histogram = latencies[endpoint] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+        histogram[bucket] += 1
+        histogram[-1] += duration
+
+
+def pool_sizes():
+    pool = db_pool.pool
+    if pool is None:
+        return 0, 0, 0
+    # psycopg2 keeps checked-out connections in _used and idle ones in _pool
+    return len(pool._used), len(pool._pool), pool.maxconn
+
+
+def render_metrics():
+    with lock:
+        current_in_flight = in_flight
+        current_latencies = {key: list(value) for key, value in latencies.items()}
+        current_responses = dict(responses)
+        current_events = dict(events)
+        current_job_runs = dict(job_runs)
+        current_job_times = {key: list(value) for key, value in job_times.items()}
+    in_use, idle, max_connections = pool_sizes()
+
+    lines = [
+        "# HELP ehotels_request_duration_seconds Request latency by endpoint",
+        "# TYPE ehotels_request_duration_seconds histogram",
+    ]
+    for endpoint, histogram in sorted(current_latencies.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, histogram):
+            cumulative += count
+            lines.append(
+                f'ehotels_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}'
+            )
+        cumulative += histogram[len(LATENCY_BUCKETS)]
+        lines.append(
+            f'ehotels_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {cumulative}'
+        )
+        lines.append(
+            f'ehotels_request_duration_seconds_sum{{endpoint="{endpoint}"}} {histogram[-1]}'
+        )
+        lines.append(
+            f'ehotels_request_duration_seconds_count{{endpoint="{endpoint}"}} {cumulative}'
+        )
+
+    lines += [
+        "# HELP ehotels_responses_total Responses by endpoint, method and status",
+        "# TYPE ehotels_responses_total counter",
+    ]
+    for (endpoint, method, status), count in sorted(current_responses.items()):
+        lines.append(
+            f'ehotels_responses_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}'
+        )
+
+    lines += [
+        "# HELP ehotels_requests_in_flight Requests being handled",
+        "# TYPE ehotels_requests_in_flight gauge",
+        f"ehotels_requests_in_flight {current_in_flight}",
+        "# HELP ehotels_db_pool_connections Pooled database connections by state",
+        "# TYPE ehotels_db_pool_connections gauge",
+        f'ehotels_db_pool_connections{{state="in_use"}} {in_use}',
+        f'ehotels_db_pool_connections{{state="idle"}} {idle}',
+        "# HELP ehotels_db_pool_max_connections Size limit of the connection pool",
+        "# TYPE ehotels_db_pool_max_connections gauge",
+        f"ehotels_db_pool_max_connections {max_connections}",
+    ]
+
+    for event, description in EVENTS.items():
+        lines += [
+            f"# HELP ehotels_{event}_total {description}",
+            f"# TYPE ehotels_{event}_total counter",
+        ]
+        for (name, endpoint), count in sorted(current_events.items()):
+            if name == event:
+                lines.append(f'ehotels_{event}_total{{endpoint="{endpoint}"}} {count}')
+
+    lines += [
+        "# HELP ehotels_job_runs_total Background job runs by outcome",
+        "# TYPE ehotels_job_runs_total counter",
+    ]
+    for (job, outcome), count in sorted(current_job_runs.items()):
+        lines.append(
+            f'ehotels_job_runs_total{{job="{job}",outcome="{outcome}"}} {count}'
+        )
+    lines += [
+        "# HELP ehotels_job_seconds_total Time spent running background jobs",
+        "# TYPE ehotels_job_seconds_total counter",
+    ]
+    for job, (seconds, _) in sorted(current_job_times.items()):
+        lines.append(f'ehotels_job_seconds_total{{job="{job}"}} {seconds}')
+    lines += [
+        "# HELP ehotels_job_last_success_seconds Unix time of the last successful run",
+        "# TYPE ehotels_job_last_success_seconds gauge",
+    ]
+    for job, (_, last_success) in sorted(current_job_times.items()):
+        if last_success is not None:
+            lines.append(f'ehotels_job_last_success_seconds{{job="{job}"}} {last_success}')
+
+    stats = sql_stats()
+    for name, key, description in (
+        ("db_queries_total", "queries", "Statements run"),
+        ("db_query_seconds_total", "db_time", "Time spent in statements"),
+        ("db_slow_queries_total", "slow", "Statements over EHOTELS_SLOW_QUERY_MS"),
+    ):
+        lines += [
+            f"# HELP ehotels_{name} {description}",
+            f"# TYPE ehotels_{name} counter",
+        ]
+        for endpoint, counters in sorted(stats.items()):
+            lines.append(f'ehotels_{name}{{endpoint="{endpoint}"}} {counters[key]}')
+
+    return "\n".join(lines) + "\n"
+
+
+@metrics.route("/metrics")
+def get_metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,162 @@
+import hashlib
+import os
+import re
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATIONS_DIR = os.path.join(ROOT, "migrations")
+SEED_FILE = os.path.join(ROOT, "seed.sql")
+
+# Held for the whole run so two deploys cannot apply migrations at once
+MIGRATE_LOCK_ID = 2132
+
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+# First line of migrations that must run outside a transaction, e.g. for
+# CREATE INDEX CONCURRENTLY
+NO_TRANSACTION = "-- migrate: no-transaction"
+
+CREATE_MIGRATIONS_TABLE = r"""CREATE TABLE IF NOT EXISTS schema_migrations (
+                                version INTEGER PRIMARY KEY,
+                                name TEXT NOT NULL,
+                                checksum TEXT NOT NULL,
+                                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                            )
+                        """
+
+
+def load_migrations():
+    """Return the migrations in MIGRATIONS_DIR, ordered by version."""
+    migrations = {}
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = MIGRATION_FILE.match(filename)
+        if match is None:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(
+                f"{filename} and {migrations[version]['filename']} have the same version"
+            )
+        with open(os.path.join(MIGRATIONS_DIR, filename)) as file:
+            sql = file.read()
+        migrations[version] = {
+            "version": version,
+            "name": match.group(2),
+            "filename": filename,
+            "sql": sql,
+            "checksum": hashlib.sha256(sql.encode()).hexdigest(),
+            "transactional": not sql.startswith(NO_TRANSACTION),
+        }
+    return [migrations[version] for version in sorted(migrations)]
+
+
+def split_statements(sql):
+    # Only used for no-transaction migrations, which hold plain statements
+    # (no function bodies), one per `;` at the end of a line
+    statements = re.split(r";[ \t]*$", sql, flags=re.MULTILINE)
+    return [
+        statement.strip()
+        for statement in statements
+        if re.sub(r"--.*$", "", statement, flags=re.MULTILINE).strip()
+    ]
+
+
+def applied_migrations(conn):
+    """Return {version: (name, checksum, applied_at)} of applied migrations."""
+    cursor = conn.cursor()
+    cursor.execute(CREATE_MIGRATIONS_TABLE)
+    cursor.execute(
+        "SELECT version, name, checksum, applied_at FROM schema_migrations"
+    )
+    applied = {row[0]: row[1:] for row in cursor.fetchall()}
+    cursor.close()
+    return applied
+
+
+def record(cursor, migration):
+    cursor.execute(
+        r"""INSERT INTO schema_migrations (version, name, checksum)
+            VALUES (%s, %s, %s)
+        """,
+        (migration["version"], migration["name"], migration["checksum"]),
+    )
+
+
+def apply(conn, migration):
+    cursor = conn.cursor()
+    if migration["transactional"]:
+        cursor.execute("BEGIN")
+        try:
+            cursor.execute(migration["sql"])
+            record(cursor, migration)
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+    else:
+        # Each statement commits on its own; they are written to be safe to
+        # run again if the migration fails halfway
+        for statement in split_statements(migration["sql"]):
+            cursor.execute(statement)
+        record(cursor, migration)
+    cursor.close()
+
+
+def migrate(conn, target=None, log=print):
+    """Apply pending migrations up to `target` (all if None), in order.
+
+    `conn` must be in autocommit mode. Returns the applied migrations.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATE_LOCK_ID,))
+    try:
+        applied = applied_migrations(conn)
+        done = []
+        for migration in load_migrations():
+            if target is not None and migration["version"] > target:
+                break
+            if migration["version"] in applied:
+                if applied[migration["version"]][1] != migration["checksum"]:
+                    log(f"Warning: {migration['filename']} changed since it was applied")
+                continue
+            log(f"Applying {migration['filename']}")
+            apply(conn, migration)
+            done.append(migration)
+        return done
+    finally:
+        cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATE_LOCK_ID,))
+        cursor.close()
+
+
+def baseline(conn, version):
+    """Mark migrations up to `version` as applied without running them.
+
+    For databases created before migrations existed, from db_setup.sql.
+    """
+    applied = applied_migrations(conn)
+    cursor = conn.cursor()
+    for migration in load_migrations():
+        if migration["version"] <= version and migration["version"] not in applied:
+            record(cursor, migration)
+    cursor.close()
+
+
+def seed(conn):
+    """Load the sample data in SEED_FILE in one transaction."""
+    with open(SEED_FILE) as file:
+        sql = file.read()
+    cursor = conn.cursor()
+    cursor.execute("BEGIN")
+    try:
+        cursor.execute(sql)
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    cursor.close()
+
+
+def reset(conn):
+    """Drop every table, function and row in the public schema."""
+    cursor = conn.cursor()
+    cursor.execute("DROP SCHEMA public CASCADE")
+    cursor.execute("CREATE SCHEMA public")
+    cursor.close()
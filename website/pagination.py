@@ -0,0 +1,56 @@
+import binascii
+import json
+import os
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from flask import abort, request, url_for
+
+EHOTELS_PAGE_SIZE = int(os.environ.get("EHOTELS_PAGE_SIZE", 50))
+EHOTELS_MAX_PAGE_SIZE = int(os.environ.get("EHOTELS_MAX_PAGE_SIZE", 500))
+
+
+def page_size():
+    size = request.args.get("page-size", EHOTELS_PAGE_SIZE, type=int)
+    return max(1, min(size, EHOTELS_MAX_PAGE_SIZE))
+
+
+def page_after(*types):
+    """Decode the `after` cursor: the sort key of the last row already shown.
+
+    `types` parse each column of the key, e.g. `page_after(int, str)`; a
+    cursor with another number of columns or a value they reject is a 400.
+    """
+    token = request.args.get("after")
+    if not token:
+        return None
+    try:
+        after = json.loads(urlsafe_b64decode(token.encode()))
+    except (binascii.Error, ValueError):
+        abort(400)
+    if not isinstance(after, list) or len(after) != len(types):
+        abort(400)
+    try:
+        return [parse(value) for parse, value in zip(types, after)]
+    except (TypeError, ValueError):
+        abort(400)
+
+
+def paginate(rows, size, key_columns):
+    """Trim rows fetched with `LIMIT size + 1` to one page.
+
+    `key_columns` are the indices of the ORDER BY columns in each row.
+    Returns the page and the URL of the next page, or None on the last page.
+    """
+    if len(rows) <= size:
+        return rows, None
+
+    rows = rows[:size]
+    key = [rows[-1][column] for column in key_columns]
+    token = urlsafe_b64encode(json.dumps(key, default=str).encode())
+    next_url = url_for(
+        request.endpoint,
+        **request.view_args,
+        after=token.decode(),
+        **{"page-size": size},
+    )
+    return rows, next_url
@@ -0,0 +1,99 @@
+import os
+import time
+import weakref
+
+import psycopg2
+from flask import g
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.pool import ThreadedConnectionPool
+
+EHOTELS_DB_POOL_MIN = int(os.environ.get("EHOTELS_DB_POOL_MIN", 1))
+EHOTELS_DB_POOL_MAX = int(os.environ.get("EHOTELS_DB_POOL_MAX", 10))
+EHOTELS_DB_PING_AFTER = int(os.environ.get("EHOTELS_DB_PING_AFTER", 30))
+pool = None
+pool_args = None
+
+# {connection: time it was returned to the pool}
+idle_since = weakref.WeakKeyDictionary()
+
+
+def init_pool(host, user, password, cursor_factory=None):
+    global pool, pool_args
+
+    pool_args = dict(
+        host=host,
+        port=5432,
+        dbname="ehotels",
+        user=user,
+        password=password,
+        cursor_factory=cursor_factory,
+    )
+    pool = ThreadedConnectionPool(EHOTELS_DB_POOL_MIN, EHOTELS_DB_POOL_MAX, **pool_args)
+    return pool
+
+
+def close_pool():
+    """Close every pooled connection, e.g. in a server's master process
+    before it forks workers, so no worker shares its sockets."""
+    if pool is not None and not pool.closed:
+        pool.closeall()
+
+
+def reset_pool():
+    """Replace the pool with a new one using the same settings. Called in
+    each forked worker; connections are opened by the worker itself."""
+    global pool
+
+    pool = ThreadedConnectionPool(EHOTELS_DB_POOL_MIN, EHOTELS_DB_POOL_MAX, **pool_args)
+    return pool
+
+
+def is_healthy(conn):
+    if conn.closed:
+        return False
+    # Only connections left idle for a while are pinged, so busy ones cost no
+    # extra round trips; the ping uses a plain cursor to stay out of the
+    # query instrumentation
+    released_at = idle_since.get(conn)
+    if released_at is None or time.monotonic() - released_at < EHOTELS_DB_PING_AFTER:
+        return True
+    try:
+        cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+        cursor.execute("SELECT 1")
+        cursor.close()
+        conn.rollback()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+def checkout():
+    # A backend may have been restarted or killed since the connection was
+    # returned, so throw away dead connections instead of handing them out
+    conn = pool.getconn()
+    while not is_healthy(conn):
+        pool.putconn(conn, close=True)
+        conn = pool.getconn()
+    idle_since.pop(conn, None)
+    return conn
+
+
+def release(conn):
+    if not conn.closed and conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+        # Never return a connection with an open or aborted transaction
+        conn.rollback()
+    if not conn.closed:
+        idle_since[conn] = time.monotonic()
+    pool.putconn(conn, close=bool(conn.closed))
+
+
+def get_db():
+    if "db" not in g:
+        g.db = checkout()
+    return g.db
+
+
+def close_db(exception=None):
+    conn = g.pop("db", None)
+    if conn is not None:
+        release(conn)
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import re
+import uuid
+import weakref
+from datetime import date
+from decimal import Decimal
+
+EHOTELS_PREPARE = os.environ.get("EHOTELS_PREPARE", "1") != "0"
+MAX_INTEGER = 2**31 - 1
+
+# {connection: {name: SQL of the statement prepared on it under that name}}
+prepared = weakref.WeakKeyDictionary()
+
+
+class Filter:
+    """A search form field and the condition it adds to a query.
+
+    `parse` turns the submitted text into the value of the %s of `condition`
+    (or a tuple of values if it has several) and raises ValueError if the
+    text is not valid.
+    """
+
+    def __init__(self, field, condition, parse=str, label=None):
+        self.field = field
+        self.condition = condition
+        self.parse = parse
+        self.label = label or field.replace("-", " ")
+
+    def params(self, text):
+        value = parse_value(text, self.parse, self.label)
+        return value if isinstance(value, tuple) else (value,)
+
+
+def parse_value(text, parse, label):
+    try:
+        return parse(text)
+    except (ValueError, ArithmeticError):
+        raise ValueError(f"Invalid {label}: {text}")
+
+
+def form_value(form, field, parse=str, label=None):
+    """Return the parsed value of `field` in `form`, or None if it is empty."""
+    text = form.get(field, "").strip()
+    if text == "":
+        return None
+    return parse_value(text, parse, label or field.replace("-", " "))
+
+
+def positive_int(text):
+    value = int(text)
+    # Compared to INTEGER columns, which cannot hold more
+    if not 0 <= value <= MAX_INTEGER:
+        raise ValueError(text)
+    return value
+
+
+def amount(text):
+    value = Decimal(text)
+    if not value.is_finite() or value < 0:
+        raise ValueError(text)
+    return value
+
+
+def iso_date(text):
+    return date.fromisoformat(text)
+
+
+def uuid_text(text):
+    return str(uuid.UUID(str(text)))
+
+
+class Query:
+    """A SELECT (with the values of its own %s, if any) and the conditions
+    added to it, in the order they are added.
+
+    Filters are always added in the order they are declared, whatever the
+    order of the form fields, so each combination of filters maps to one
+    statement text, which is prepared once per connection.
+    """
+
+    def __init__(self, select, *params):
+        self.select = select
+        self.conditions = []
+        self.values = params
+
+    def where(self, condition, *params):
+        self.conditions.append(condition)
+        self.values += params
+        return self
+
+    def filter(self, filters, form):
+        """Add the `filters` whose field is filled in `form`. Raises
+        ValueError if a value is not valid."""
+        for f in filters:
+            text = form.get(f.field, "").strip()
+            if text != "":
+                self.where(f.condition, *f.params(text))
+        return self
+
+    def sql(self, suffix=""):
+        where = ""
+        if self.conditions:
+            where = " WHERE " + " AND ".join(self.conditions)
+        return self.select.rstrip() + where + suffix
+
+    def execute(self, cursor, suffix="", params=()):
+        execute_prepared(cursor, self.sql(suffix), self.values + params)
+
+
+def to_positional(sql):
+    """Turn the %s placeholders of `sql` into $1, $2, ... for PREPARE."""
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        if match.group(1) == "%":
+            return "%"
+        count += 1
+        return f"${count}"
+
+    return re.sub(r"%([%s])", replace, sql)
+
+
+def prepared_sql(connection, query):
+    """Return the SQL that `query` runs if it is an EXECUTE of a statement
+    prepared by execute_prepared() on `connection`, else `query` itself."""
+    match = isinstance(query, str) and re.match(r"EXECUTE (ehotels_\w+)", query)
+    if match:
+        return prepared.get(connection, {}).get(match.group(1), query)
+    return query
+
+
+def execute_prepared(cursor, sql, params=()):
+    """Run `sql` as a prepared statement of the cursor's connection, so that
+    Postgres can reuse its plan, preparing it on first use."""
+    if not EHOTELS_PREPARE:
+        cursor.execute(sql, params)
+        return
+
+    name = "ehotels_" + hashlib.sha1(sql.encode()).hexdigest()[:16]
+    statements = prepared.setdefault(cursor.connection, {})
+    if name not in statements:
+        # Prepared statements outlive the transaction, even if it rolls back
+        cursor.execute(f"PREPARE {name} AS {to_positional(sql)}")
+        statements[name] = sql
+    if params:
+        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cursor.execute(f"EXECUTE {name}")
@@ -0,0 +1,125 @@
+from datetime import date
+
+from . import db
+from .query_builder import Filter, Query
+
+# Longest period a report may cover
+MAX_REPORT_DAYS = 366 * 10
+
+# {group: (columns, headers)} of the occupancy report
+REPORT_GROUPS = {
+    "hotel": (
+        ("hotels.hotel_id", "chains.chain_name", "hotels.city"),
+        ("Hotel ID", "Chain Name", "City"),
+    ),
+    "chain": (
+        ("chains.chain_id", "chains.chain_name"),
+        ("Chain ID", "Chain Name"),
+    ),
+    "area": (
+        ("hotels.country", "hotels.province_or_state", "hotels.city"),
+        ("Country", "Province/State", "City"),
+    ),
+}
+
+REPORT_FILTERS = (
+    Filter("chain", "chains.chain_name = %s"),
+    Filter("country", "hotels.country = %s"),
+    Filter("province-or-state", "hotels.province_or_state = %s"),
+    Filter("city", "hotels.city = %s"),
+)
+
+# Sums the daily rollups of each hotel over [start_date, end_date), so a year
+# reads 365 rows per hotel instead of every stay. Days without a rollup row
+# had no stay when the queue was last refreshed: they count the hotel's rooms
+# as available and none as occupied. Takes (start_date, end_date, days).
+REPORT_QUERY = r"""WITH stats AS (
+                        SELECT hotel_id,
+                            COUNT(*) AS num_days,
+                            SUM(num_rooms) AS room_nights,
+                            SUM(occupied_rooms) AS occupied_nights,
+                            SUM(revenue) AS revenue
+                        FROM daily_hotel_stats
+                        WHERE day >= %s AND day < %s
+                        GROUP BY hotel_id
+                    )
+                    SELECT {columns},
+                        SUM(
+                            COALESCE(stats.room_nights, 0)
+                            + (%s - COALESCE(stats.num_days, 0)) * hotels.num_rooms
+                        ) AS room_nights,
+                        SUM(COALESCE(stats.occupied_nights, 0)) AS occupied_nights,
+                        SUM(COALESCE(stats.revenue, 0)) AS revenue
+                    FROM hotels
+                    JOIN chains
+                    ON hotels.chain_id = chains.chain_id
+                    LEFT JOIN stats
+                    ON stats.hotel_id = hotels.hotel_id
+                """
+
+
+def default_period(today=None):
+    """This calendar year, [January 1, January 1 of next year)."""
+    today = today or date.today()
+    return date(today.year, 1, 1), date(today.year + 1, 1, 1)
+
+
+def occupancy_report(group, start_date, end_date, form=None):
+    """Return the occupancy, ADR and RevPAR of each hotel, chain or area
+    (`group`) over [start_date, end_date), narrowed by REPORT_FILTERS in
+    `form`. Each row is a dict of the group's columns, room_nights,
+    occupied_nights, revenue, occupancy, adr and revpar. Raises ValueError
+    for an invalid group, period or filter."""
+    if group not in REPORT_GROUPS:
+        raise ValueError(f"Invalid group: {group}")
+    num_days = (end_date - start_date).days
+    if not 0 < num_days <= MAX_REPORT_DAYS:
+        raise ValueError(f"The period must be 1 to {MAX_REPORT_DAYS} days")
+
+    columns, _ = REPORT_GROUPS[group]
+    query = Query(
+        REPORT_QUERY.format(columns=", ".join(columns)),
+        start_date,
+        end_date,
+        num_days,
+    ).filter(REPORT_FILTERS, form or {})
+    group_by = ", ".join(columns)
+
+    cursor = db.cursor()
+    query.execute(cursor, f" GROUP BY {group_by} ORDER BY {group_by}")
+    rows = cursor.fetchall()
+    cursor.close()
+
+    report = []
+    for row in rows:
+        room_nights, occupied_nights, revenue = (
+            float(value) for value in row[len(columns) :]
+        )
+        report.append(
+            {
+                "group": list(row[: len(columns)]),
+                "room_nights": int(room_nights),
+                "occupied_nights": int(occupied_nights),
+                "revenue": round(revenue, 2),
+                "occupancy": (
+                    round(occupied_nights / room_nights, 4) if room_nights else None
+                ),
+                "adr": round(revenue / occupied_nights, 2) if occupied_nights else None,
+                "revpar": round(revenue / room_nights, 2) if room_nights else None,
+            }
+        )
+    return report
+
+
+def report_freshness():
+    """Return (refreshed_at, pending ranges) of the daily rollups."""
+    cursor = db.cursor()
+    cursor.execute(
+        r"""SELECT
+                (SELECT refreshed_at FROM view_refreshes WHERE view_name = 'daily_hotel_stats'),
+                (SELECT COUNT(*) FROM daily_hotel_stats_queue)
+        """
+    )
+    freshness = cursor.fetchone()
+    cursor.close()
+    return freshness
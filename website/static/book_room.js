@@ -0,0 +1,43 @@
+let calendar = document.querySelector("#availability");
+
+function show_availability(data) {
+  let room = data.rooms.find(
+    (room) => room.room_number === calendar.dataset.roomNumber
+  );
+  if (room === undefined) {
+    return;
+  }
+
+  let day = new Date(data.start_date + "T00:00:00");
+  let month = null;
+  let row = null;
+  for (let night of room.occupied) {
+    if (day.getMonth() !== month) {
+      month = day.getMonth();
+      let label = document.createElement("h6");
+      label.className = "mt-3";
+      label.textContent = day.toLocaleString("default", {
+        month: "long",
+        year: "numeric",
+      });
+      row = document.createElement("div");
+      row.className = "d-flex flex-wrap";
+      calendar.append(label, row);
+    }
+    let cell = document.createElement("span");
+    cell.className =
+      "border text-center " +
+      (night === "1" ? "bg-secondary text-white" : "bg-light");
+    cell.style.width = "2.5em";
+    cell.textContent = day.getDate();
+    cell.title = night === "1" ? "Booked" : "Available";
+    row.append(cell);
+    day.setDate(day.getDate() + 1);
+  }
+}
+
+if (calendar !== null) {
+  fetch(calendar.dataset.url)
+    .then((response) => response.json())
+    .then(show_availability);
+}
@@ -0,0 +1,34 @@
+let first_name = document.querySelector("#first-name");
+let last_name = document.querySelector("#last-name");
+let timer = null;
+
+function show_options(input, names) {
+  let options = document.querySelector("#" + input.id + "-options");
+  options.replaceChildren(
+    ...[...new Set(names)].map((name) => {
+      let option = document.createElement("option");
+      option.value = name;
+      return option;
+    })
+  );
+}
+
+function suggest(input) {
+  let text = (first_name.value + " " + last_name.value).trim();
+  if (text.length < 2) {
+    return;
+  }
+  fetch("/customers/search?q=" + encodeURIComponent(text))
+    .then((response) => (response.ok ? response.json() : []))
+    .then((customers) => {
+      let key = input === first_name ? "first_name" : "last_name";
+      show_options(input, customers.map((customer) => customer[key]));
+    });
+}
+
+for (let input of [first_name, last_name]) {
+  input.addEventListener("input", () => {
+    clearTimeout(timer);
+    timer = setTimeout(() => suggest(input), 150);
+  });
+}
@@ -0,0 +1,85 @@
+import csv
+import io
+import os
+import uuid
+
+from flask import Response, stream_template, stream_with_context
+
+from . import db
+
+EHOTELS_STREAM_ITERSIZE = int(os.environ.get("EHOTELS_STREAM_ITERSIZE", 2000))
+CHUNK_SIZE = 16 * 1024
+
+
+def stream_rows(query, data=()):
+    """Return the rows of `query` from a named (server-side) cursor, fetched
+    `itersize` rows at a time.
+
+    The query and its first fetch run right away, so their errors are raised
+    before the response starts. The rows must be consumed inside the request,
+    e.g. by a template passed to `stream_html` or by `stream_csv`.
+    """
+    cursor = db.cursor(name=f"stream_{uuid.uuid4().hex}")
+    cursor.itersize = EHOTELS_STREAM_ITERSIZE
+    try:
+        cursor.execute(query, data)
+        first = cursor.fetchmany(EHOTELS_STREAM_ITERSIZE)
+    except Exception:
+        close_stream(cursor)
+        raise
+    return iterate_rows(cursor, first)
+
+
+def iterate_rows(cursor, first):
+    try:
+        yield from first
+        yield from cursor
+    finally:
+        close_stream(cursor)
+
+
+def close_stream(cursor):
+    cursor.close()
+    # Named cursors live in a transaction; end it so the connection can go
+    # back to the pool
+    db.rollback()
+
+
+def buffered(chunks):
+    # Jinja yields one small string per template node; batch them up so the
+    # server writes a few large chunks instead of one per table cell
+    buffer = []
+    length = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= CHUNK_SIZE:
+            yield "".join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def stream_html(template_name, **context):
+    return Response(buffered(stream_template(template_name, **context)))
+
+
+def stream_csv(filename, header, rows):
+    def generate():
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            if output.tell() >= CHUNK_SIZE:
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate()
+        yield output.getvalue()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
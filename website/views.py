@@ -1,14 +1,132 @@
+import os
 import traceback
-from datetime import date
+from datetime import date, datetime, timedelta, timezone
 
-from flask import (Blueprint, flash, redirect, render_template, request,
-                   session, url_for)
-from psycopg2.errors import IntegrityError, RaiseException
+from flask import (Blueprint, abort, flash, jsonify, redirect, render_template,
+                   request, session, url_for)
+from psycopg2.errors import ExclusionViolation, IntegrityError
 
 from . import db
+from .availability import (MAX_MONTHS, MAX_YEARS_AWAY, add_months,
+                           get_calendar, invalidate_calendar, to_runs)
+from .bulk_import import IMPORT_COLUMNS, import_file
+from .customer_search import name_condition, name_params, search_customers
+from .facets import get_facets, invalidate_facets
+from .metrics import increment
+from .pagination import page_after, page_size, paginate
+from .query_builder import (Filter, Query, amount, execute_prepared,
+                            form_value, iso_date, positive_int, uuid_text)
+from .reports import (REPORT_GROUPS, default_period, occupancy_report,
+                      report_freshness)
+from .streaming import stream_csv, stream_html, stream_rows
+
+EHOTELS_AREA_STALE_AFTER = int(os.environ.get("EHOTELS_AREA_STALE_AFTER", 900))
 
 views = Blueprint("views", __name__)
 
+ROOMS_CSV_HEADER = (
+    "chain_name",
+    "stars",
+    "num_rooms",
+    "country",
+    "province_or_state",
+    "city",
+    "address",
+    "room_number",
+    "capacity",
+    "view",
+    "price",
+    "hotel_id",
+)
+ROOM_FILTERS = (
+    Filter("chain", "chains.chain_name = %s"),
+    Filter("stars", "hotels.stars >= %s", positive_int),
+    Filter("num-rooms", "hotels.num_rooms >= %s", positive_int, "number of rooms"),
+    Filter("country", "hotels.country = %s"),
+    Filter("province-or-state", "hotels.province_or_state = %s"),
+    Filter("city", "hotels.city = %s"),
+    Filter("capacity", "rooms.capacity = %s", positive_int),
+    Filter("price", "rooms.price <= %s", amount),
+)
+# Same test as get_available_rooms, inlined so that it composes with
+# ROOM_FILTERS in one statement: the facets narrow the rooms through the
+# hotel and room indexes, and each remaining room is probed through the
+# bookings_no_overlap index. Takes (start_date, end_date).
+ROOM_AVAILABLE = r"""NOT EXISTS (
+                        SELECT 1
+                        FROM bookings
+                        WHERE bookings.hotel_id = rooms.hotel_id
+                            AND bookings.room_number = rooms.room_number
+                            AND daterange(bookings.start_date, bookings.end_date)
+                                && daterange(%s, %s)
+                    )"""
+# Keyset on the /rooms/ ORDER BY columns; the cursor only carries hotel_id and
+# room_number since the hotel determines the chain. Takes
+# (hotel_id, hotel_id, room_number).
+ROOMS_KEYSET = r"""(hotels.chain_id, rooms.hotel_id, rooms.room_number)
+                    > ((SELECT chain_id FROM hotels WHERE hotel_id = %s), %s, %s)"""
+BOOKING_FILTERS = (
+    Filter("first-name", name_condition("customers.first_name"), name_params),
+    Filter("last-name", name_condition("customers.last_name"), name_params),
+)
+AREA_FILTERS = (
+    Filter("country", "country = %s"),
+    Filter("province-or-state", "province_or_state = %s"),
+    Filter("city", "city = %s"),
+)
+ROOM_CAPACITIES_CSV_HEADER = (
+    "chain_name",
+    "hotel_id",
+    "country",
+    "province_or_state",
+    "city",
+    "room_number",
+    "capacity",
+)
+# Statements of the /rent/ pages, also timed by benchmarks/rent_round_trips.py.
+# Booking, room price, customer and any rental in one round trip. Takes
+# (booking_id).
+RENT_BOOKING_QUERY = r"""SELECT bookings.hotel_id,
+                            bookings.room_number,
+                            bookings.start_date,
+                            bookings.end_date,
+                            rooms.price,
+                            customers.customer_id,
+                            customers.ssn,
+                            customers.registration_date,
+                            customers.first_name,
+                            customers.last_name,
+                            rentals.paid_amount
+                        FROM bookings
+                        JOIN rooms
+                        ON bookings.hotel_id = rooms.hotel_id
+                            AND bookings.room_number = rooms.room_number
+                        JOIN customers
+                        ON bookings.customer_id = customers.customer_id
+                        LEFT OUTER JOIN rentals
+                        ON bookings.booking_id = rentals.booking_id
+                        WHERE bookings.booking_id = %s
+                        LIMIT 1
+                    """
+# The customer, room and dates are copied from the booking. Takes
+# (paid_amount, booking_id).
+RENT_CHECK_IN_QUERY = r"""INSERT INTO rentals
+                        (customer_id, booking_id, hotel_id, room_number, start_date, end_date, paid_amount)
+                        SELECT customer_id, booking_id, hotel_id, room_number, start_date, end_date, %s
+                        FROM bookings
+                        WHERE booking_id = %s
+                        RETURNING rental_id, hotel_id, start_date, end_date
+                    """
+# The customer is looked up by SSN in the same statement. Takes (hotel_id,
+# room_number, start_date, end_date, paid_amount, ssn).
+RENT_WALK_IN_QUERY = r"""INSERT INTO rentals
+                        (customer_id, hotel_id, room_number, start_date, end_date, paid_amount)
+                        SELECT customer_id, %s, %s, %s, %s, %s
+                        FROM customers
+                        WHERE ssn = %s
+                        RETURNING rental_id
+                    """
+
 
 @views.route("/")
 def home():
@@ -82,17 +200,27 @@ def employees(employee_id=None):
                 JOIN positions
                 ON employees.position_id = positions.position_id
             """
+    size = page_size()
+    after = page_after(int)
+
     cursor = db.cursor()
     if employee_id:
         cursor.execute(
             query + "WHERE employee_id = %s",
             (employee_id,),
         )
+    elif after is not None:
+        cursor.execute(
+            query + "WHERE employee_id > %s ORDER BY employee_id LIMIT %s",
+            (after[0], size + 1),
+        )
     else:
-        cursor.execute(query)
-    employees = cursor.fetchall()
+        cursor.execute(query + "ORDER BY employee_id LIMIT %s", (size + 1,))
+    employees, next_url = paginate(cursor.fetchall(), size, (0,))
     cursor.close()
-    return render_template("employees.html", session=session, employees=employees)
+    return render_template(
+        "employees.html", session=session, employees=employees, next_url=next_url
+    )
 
 
 @views.route("/rooms/", methods=["GET", "POST"])
@@ -100,64 +228,7 @@ def employees(employee_id=None):
 def rooms(chain_id=None, hotel_id=None):
     cursor = db.cursor()
 
-    capacities_query = r"""SELECT DISTINCT capacity
-                            FROM rooms
-                            ORDER BY capacity
-                        """
-    cursor.execute(capacities_query)
-    capacities = cursor.fetchall()
-    capacities = [capacity[0] for capacity in capacities]
-
-    chains_query = r"""SELECT DISTINCT chain_name
-                        FROM chains
-                        ORDER BY chain_name
-                    """
-    cursor.execute(chains_query)
-    chains = cursor.fetchall()
-    chains = [chain[0] for chain in chains]
-
-    countries_query = r"""SELECT DISTINCT country
-                            FROM hotels
-                            ORDER BY country
-                        """
-    cursor.execute(countries_query)
-    countries = cursor.fetchall()
-    countries = [country[0] for country in countries]
-
-    provinces_or_states_query = r"""SELECT DISTINCT province_or_state
-                                    FROM hotels
-                                    ORDER BY province_or_state
-                                """
-    cursor.execute(provinces_or_states_query)
-    provinces_or_states = cursor.fetchall()
-    provinces_or_states = [
-        province_or_state[0] for province_or_state in provinces_or_states
-    ]
-
-    cities_query = r"""SELECT DISTINCT city
-                        FROM hotels
-                        ORDER BY city
-                    """
-    cursor.execute(cities_query)
-    cities = cursor.fetchall()
-    cities = [city[0] for city in cities]
-
-    stars_query = r"""SELECT DISTINCT stars
-                        FROM hotels
-                        ORDER BY stars
-                    """
-    cursor.execute(stars_query)
-    stars = cursor.fetchall()
-    stars = [star[0] for star in stars]
-
-    num_rooms_query = r"""SELECT DISTINCT num_rooms
-                            FROM hotels
-                            ORDER BY num_rooms
-                        """
-    cursor.execute(num_rooms_query)
-    num_rooms = cursor.fetchall()
-    num_rooms = [num_room[0] for num_room in num_rooms]
-    max_num_rooms = max(num_rooms)
+    facets = get_facets()
 
     query = r"""SELECT chains.chain_name,
                     hotels.stars,
@@ -179,52 +250,31 @@ def rooms(chain_id=None, hotel_id=None):
                 JOIN view_types
                 ON rooms.view_type = view_types.id
             """
+
+    size = page_size()
+    after = page_after(int, str)
+    order_by = " ORDER BY hotels.chain_id, rooms.hotel_id, rooms.room_number LIMIT %s"
+
     if request.method == "POST":
-        if request.form.get("start-date") != "" and request.form.get("end-date") != "":
-            cursor.execute(
-                "SELECT * FROM get_available_rooms(%s, %s)",
-                (request.form.get("start-date"), request.form.get("end-date")),
-            )
-        else:
-            cursor.execute(
-                query
-                + "WHERE 1=1"
-                + (
-                    " AND chains.chain_name = %s"
-                    if request.form.get("chain") != ""
-                    else ""
-                )
-                + (" AND hotels.stars >= %s" if request.form.get("stars") != "" else "")
-                + (
-                    " AND hotels.num_rooms >= %s"
-                    if request.form.get("num-rooms") != ""
-                    else ""
-                )
-                + (
-                    " AND hotels.country = %s"
-                    if request.form.get("country") != ""
-                    else ""
-                )
-                + (
-                    " AND hotels.province_or_state = %s"
-                    if request.form.get("province-or-state") != ""
-                    else ""
-                )
-                + (" AND hotels.city = %s" if request.form.get("city") != "" else "")
-                + (
-                    " AND rooms.capacity = %s"
-                    if request.form.get("capacity") != ""
-                    else ""
-                )
-                + (" AND rooms.price <= %s" if request.form.get("price") != "" else "")
-                + " ORDER BY hotels.chain_id, rooms.hotel_id, rooms.room_number",
-                tuple(
-                    request.form.get(key)
-                    for key in request.form
-                    if request.form.get(key) != ""
-                ),
-            )
-        rooms = cursor.fetchall()
+        rooms = []
+        try:
+            search = Query(query).filter(ROOM_FILTERS, request.form)
+            start_date = form_value(request.form, "start-date", iso_date)
+            end_date = form_value(request.form, "end-date", iso_date)
+            if (start_date is None) != (end_date is None):
+                raise ValueError("Both Start Date and End Date are required")
+            if start_date is not None:
+                if end_date <= start_date:
+                    raise ValueError("End Date must follow Start Date")
+                search.where(ROOM_AVAILABLE, start_date, end_date)
+            if after is not None:
+                search.where(ROOMS_KEYSET, after[0], after[0], after[1])
+            search.execute(cursor, order_by, (size + 1,))
+            rooms = cursor.fetchall()
+        except ValueError as e:
+            flash(str(e), "danger")
+        rooms, next_url = paginate(rooms, size, (11, 7))
+        cursor.close()
         return render_template(
             "rooms.html",
             session=session,
@@ -232,27 +282,41 @@ def rooms(chain_id=None, hotel_id=None):
             chain_id=chain_id,
             hotel_id=hotel_id,
             rooms=rooms,
-            capacities=capacities,
-            countries=countries,
-            cities=cities,
-            chains=chains,
-            provinces_or_states=provinces_or_states,
-            stars=stars,
-            num_rooms=num_rooms,
-            max_num_rooms=max_num_rooms,
+            next_url=next_url,
+            **facets,
         )
     elif request.method == "GET":
-        if hotel_id:
-            cursor.execute(
+        stream = request.args.get("stream")
+        if stream in ("html", "csv"):
+            # Whole inventory, sent as it is read from a server-side cursor
+            cursor.close()
+            rooms = stream_rows(
                 query
-                + "WHERE rooms.hotel_id = %s ORDER BY hotels.chain_id, rooms.hotel_id, rooms.room_number",
-                (hotel_id,),
+                + ("WHERE rooms.hotel_id = %s" if hotel_id else "")
+                + " ORDER BY hotels.chain_id, rooms.hotel_id, rooms.room_number",
+                (hotel_id,) if hotel_id else (),
             )
-        else:
-            cursor.execute(
-                query + " ORDER BY hotels.chain_id, rooms.hotel_id, rooms.room_number"
+            if stream == "csv":
+                return stream_csv("rooms.csv", ROOMS_CSV_HEADER, rooms)
+            return stream_html(
+                "rooms.html",
+                session=session,
+                form=None,
+                chain_id=chain_id,
+                hotel_id=hotel_id,
+                rooms=rooms,
+                next_url=None,
+                **facets,
             )
-        rooms = cursor.fetchall()
+
+        search = Query(query)
+        if hotel_id:
+            search.where("rooms.hotel_id = %s", hotel_id)
+        if after is not None:
+            search.where(ROOMS_KEYSET, after[0], after[0], after[1])
+        search.execute(cursor, order_by, (size + 1,))
+        rooms, next_url = paginate(cursor.fetchall(), size, (11, 7))
+        cursor.close()
         return render_template(
             "rooms.html",
             session=session,
@@ -260,18 +324,10 @@ def rooms(chain_id=None, hotel_id=None):
             chain_id=chain_id,
             hotel_id=hotel_id,
             rooms=rooms,
-            capacities=capacities,
-            countries=countries,
-            cities=cities,
-            chains=chains,
-            provinces_or_states=provinces_or_states,
-            stars=stars,
-            num_rooms=num_rooms,
-            max_num_rooms=max_num_rooms,
+            next_url=next_url,
+            **facets,
         )
 
-    cursor.close()
-
 
 @views.route("/book-room/<int:hotel_id>/<string:room_number>", methods=["GET", "POST"])
 def book_room(hotel_id=None, room_number=None):
@@ -310,7 +366,7 @@ def book_room(hotel_id=None, room_number=None):
                 request.form.get("start-date") != ""
                 and request.form.get("end-date") != ""
             ):
-                if request.form.get("end-date") < request.form.get("start-date"):
+                if request.form.get("end-date") <= request.form.get("start-date"):
                     flash("End Date must follow Start Date", "danger")
                 else:
                     booking_query = r"""INSERT INTO
@@ -330,7 +386,9 @@ def book_room(hotel_id=None, room_number=None):
                     )
                     booking = cursor.fetchone()
                     db.commit()
-        except RaiseException:
+                    invalidate_calendar(hotel_id, booking[1], booking[2])
+        except ExclusionViolation:
+            increment("booking_conflicts")
             flash("Room is already booked. Try different dates", "danger")
             db.rollback()
             traceback.print_exc()
@@ -353,6 +411,7 @@ def delete_room(hotel_id=None, room_number=None):
     if deleted_room is not None:
         flash("Successfully deleted room", "success")
     db.commit()
+    invalidate_facets()
     cursor.close()
     return redirect(url_for("views.rooms"))
 
@@ -474,6 +533,7 @@ def delete_chain(chain_id=None):
             flash("Successfully deleted chain", "success")
 
         db.commit()
+        invalidate_facets()
         cursor.close()
     except IntegrityError:
         flash("Cannot delete chain", "danger")
@@ -501,6 +561,7 @@ def edit_chain(chain_id=None):
             if changed_name is not None:
                 flash("Successfully updated chain name", "success")
             db.commit()
+            invalidate_facets()
         except IntegrityError:
             flash("Unable to update chain", "danger")
             db.rollback()
@@ -923,6 +984,7 @@ def edit_room_details(hotel_id=None, room_number=None):
             )
             room = cursor.fetchone()
             db.commit()
+            invalidate_facets()
             if room is not None:
                 flash("Successfully updated room details", "success")
         except IntegrityError:
@@ -1049,6 +1111,7 @@ def edit_hotel_address(hotel_id=None):
             )
             hotel_id = cursor.fetchone()
             db.commit()
+            invalidate_facets()
             if hotel_id is not None:
                 hotel_id = hotel_id[0]
                 flash("Successfully updated hotel address", "success")
@@ -1073,6 +1136,7 @@ def delete_hotel(hotel_id=None):
             hotel_id = hotel_id[0]
             flash("Successfully deleted hotel", "success")
         db.commit()
+        invalidate_facets()
         cursor.close()
     except IntegrityError:
         flash("Unable to delete hotel", "danger")
@@ -1136,6 +1200,7 @@ def edit_hotel_stars(hotel_id=None):
             (request.form.get("stars"), hotel_id),
         )
         db.commit()
+        invalidate_facets()
         cursor.close()
         flash("Successfully updated hotel stars", "success")
     except IntegrityError:
@@ -1170,38 +1235,47 @@ def bookings():
                 ON bookings.booking_id = rentals.booking_id
             """
 
-    if request.method == "GET":
-        cursor.execute(query)
-        bookings = cursor.fetchall()
-    elif request.method == "POST":
-        form = request.form
-        data = (
-            request.form.get("first-name"),
-            request.form.get("last-name"),
-        )
-        data = tuple(filter(lambda x: x != "", data))
-        data = tuple((f"%{x}%",) for x in data)
+    size = page_size()
+    after = page_after(iso_date, uuid_text)
+    order_by = " ORDER BY bookings.start_date, bookings.booking_id LIMIT %s"
 
-        cursor.execute(
-            query
-            + " WHERE 1=1"
-            + (
-                " AND customers.first_name ILIKE %s"
-                if request.form.get("first-name") != ""
-                else ""
-            )
-            + (
-                " AND customers.last_name ILIKE %s"
-                if request.form.get("last-name") != ""
-                else ""
-            ),
-            data,
-        )
-        bookings = cursor.fetchall()
+    search = Query(query)
+    if request.method == "POST":
+        form = request.form
+        search.filter(BOOKING_FILTERS, request.form)
+    if after is not None:
+        search.where("(bookings.start_date, bookings.booking_id) > (%s, %s)", *after)
+    search.execute(cursor, order_by, (size + 1,))
+    bookings = cursor.fetchall()
 
+    bookings, next_url = paginate(bookings, size, (3, 8))
     cursor.close()
     return render_template(
-        "bookings.html", session=session, form=form, bookings=bookings
+        "bookings.html",
+        session=session,
+        form=form,
+        bookings=bookings,
+        next_url=next_url,
+    )
+
+
+@views.route("/customers/search")
+def customer_search():
+    user = session.get("user")
+    if user is None or user.get("type") != "employee":
+        abort(403)
+
+    customers = search_customers(request.args.get("q", ""))
+    return jsonify(
+        [
+            {
+                "customer_id": customer_id,
+                "first_name": first_name,
+                "last_name": last_name,
+                "score": float(score),
+            }
+            for customer_id, first_name, last_name, score in customers
+        ]
     )
 
 
@@ -1221,45 +1295,14 @@ def rent(
     end_date=None,
 ):
     cursor = db.cursor()
-    if booking_id is not None:
-        query = r"""SELECT bookings.hotel_id,
-                            bookings.room_number,
-                            bookings.start_date,
-                            bookings.end_date,
-                            rooms.price
-                    FROM bookings
-                    JOIN rooms
-                    ON bookings.hotel_id = rooms.hotel_id
-                        AND bookings.room_number = rooms.room_number
-                    WHERE bookings.booking_id = %s
-                """
-        cursor.execute(query, (booking_id,))
-        booking = cursor.fetchone()
-
-        customer_query = r"""SELECT customers.customer_id,
-                                    customers.ssn,
-                                    customers.registration_date,
-                                    customers.first_name,
-                                    customers.last_name
-                                FROM bookings
-                                JOIN customers
-                                ON bookings.customer_id = customers.customer_id
-                                WHERE bookings.booking_id = %s
-                            """
-        cursor.execute(customer_query, (booking_id,))
-        customer = cursor.fetchone()
-
-        paid_query = r"""SELECT rentals.paid_amount
-                            FROM rentals
-                            WHERE rentals.booking_id = %s
-                    """
-        cursor.execute(paid_query, (booking_id,))
-        paid = cursor.fetchone()
-        if paid is not None:
-            paid = paid[0]
-
     if request.method == "GET":
         if booking_id is not None:
+            execute_prepared(cursor, RENT_BOOKING_QUERY, (booking_id,))
+            row = cursor.fetchone()
+            cursor.close()
+            booking = customer = paid = None
+            if row is not None:
+                booking, customer, paid = row[:5], row[5:10], row[10]
             return render_template(
                 "rent.html",
                 session=session,
@@ -1269,6 +1312,7 @@ def rent(
                 paid=paid,
             )
         else:
+            cursor.close()
             return render_template(
                 "rent.html",
                 session=session,
@@ -1283,61 +1327,62 @@ def rent(
     elif request.method == "POST":
         if booking_id is not None:
             try:
-                rent_query = r"""INSERT INTO rentals
-                                (customer_id, booking_id, hotel_id, room_number, start_date, end_date, paid_amount)
-                                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                                RETURNING rental_id
-                            """
-                cursor.execute(
-                    rent_query,
-                    (
-                        customer[0],
-                        booking_id,
-                        booking[0],
-                        booking[1],
-                        booking[2],
-                        booking[3],
-                        request.form.get("paid-amount"),
-                    ),
+                execute_prepared(
+                    cursor,
+                    RENT_CHECK_IN_QUERY,
+                    (request.form.get("paid-amount"), booking_id),
                 )
-                rental_id = cursor.fetchone()[0]
-                if rental_id is not None:
+                rental = cursor.fetchone()
+                if rental is not None:
                     flash("Successfully rented room", "success")
+                else:
+                    flash("Unable to rent room", "danger")
                 db.commit()
                 cursor.close()
+                if rental is not None:
+                    invalidate_calendar(rental[1], rental[2], rental[3])
             except IntegrityError:
+                increment("rental_integrity_errors")
                 flash("Unable to rent room", "danger")
                 db.rollback()
                 traceback.print_exc()
 
             return redirect(url_for("views.rent", booking_id=booking_id))
         else:
-            new_rent_query = r"""INSERT INTO rentals
-                                (customer_id, hotel_id, room_number, start_date, end_date, paid_amount)
-                                VALUES (%s, %s, %s, %s, %s, %s)
-                                RETURNING rental_id
-                            """
-
-            customer_query = r"""SELECT customer_id FROM customers WHERE ssn = %s"""
-            cursor.execute(customer_query, (customer_ssn,))
-            customer_id = cursor.fetchone()[0]
-
-            cursor.execute(
-                new_rent_query,
-                (
-                    customer_id,
-                    hotel_id,
-                    room_number,
-                    start_date,
-                    end_date,
-                    request.form.get("paid-amount"),
-                ),
-            )
-            rental_id = cursor.fetchone()
-            if rental_id is not None:
-                flash("Successfully rented room", "success")
-            cursor.close()
-            db.commit()
+            try:
+                if date.fromisoformat(end_date) <= date.fromisoformat(start_date):
+                    raise ValueError
+            except ValueError:
+                flash("End Date must follow Start Date", "danger")
+                cursor.close()
+                return redirect(url_for("views.rent"))
+            try:
+                execute_prepared(
+                    cursor,
+                    RENT_WALK_IN_QUERY,
+                    (
+                        hotel_id,
+                        room_number,
+                        start_date,
+                        end_date,
+                        request.form.get("paid-amount"),
+                        customer_ssn,
+                    ),
+                )
+                rental_id = cursor.fetchone()
+                if rental_id is not None:
+                    flash("Successfully rented room", "success")
+                else:
+                    flash(f"No customer with SSN {customer_ssn}", "danger")
+                cursor.close()
+                db.commit()
+                if rental_id is not None:
+                    invalidate_calendar(hotel_id, start_date, end_date)
+            except IntegrityError:
+                increment("rental_integrity_errors")
+                flash("Unable to rent room", "danger")
+                db.rollback()
+                traceback.print_exc()
 
             return redirect(url_for("views.rent"))
 
@@ -1364,18 +1409,21 @@ def get_available_rooms():
                         description,
                         price,
                         hotel_id
-                FROM get_available_rooms(%s, %s)
-                WHERE hotel_id = %s
+                FROM get_available_rooms(%s, %s, filter_hotel_id => %s)
             """
-    cursor.execute(
-        query,
-        (
-            date.fromisoformat(request.args.get("start-date")),
-            date.fromisoformat(request.args.get("end-date")),
-            hotel_id,
-        ),
-    )
-    rooms = cursor.fetchall()
+    # A NULL filter_hotel_id means every hotel, but an employee without a
+    # hotel has no rooms to offer
+    rooms = []
+    if hotel_id is not None:
+        cursor.execute(
+            query,
+            (
+                date.fromisoformat(request.args.get("start-date")),
+                date.fromisoformat(request.args.get("end-date")),
+                hotel_id,
+            ),
+        )
+        rooms = cursor.fetchall()
 
     return render_template(
         "available_rooms.html",
@@ -1388,6 +1436,43 @@ def get_available_rooms():
     )
 
 
+@views.route("/availability/<int:hotel_id>", methods=["GET"])
+def availability(hotel_id=None):
+    """Occupancy calendar of every room of a hotel, as JSON.
+
+    `month` (YYYY-MM, default this month) and `months` (default 1) select the
+    window. Each room gets a bitmap with one character per night, 1 if taken,
+    or with `format=rle` the [offset, nights] runs of taken nights.
+    """
+    try:
+        if request.args.get("month"):
+            first_month = date.fromisoformat(request.args.get("month") + "-01")
+        else:
+            first_month = date.today().replace(day=1)
+        num_months = int(request.args.get("months", 1))
+    except ValueError:
+        abort(400)
+    if not 1 <= num_months <= MAX_MONTHS:
+        abort(400)
+    if abs(first_month.year - date.today().year) > MAX_YEARS_AWAY:
+        abort(400)
+
+    calendar = get_calendar(hotel_id, first_month, num_months)
+    rle = request.args.get("format") == "rle"
+    return jsonify(
+        hotel_id=hotel_id,
+        start_date=first_month.isoformat(),
+        nights=(add_months(first_month, num_months) - first_month).days,
+        rooms=[
+            {
+                "room_number": room_number,
+                "occupied": to_runs(bitmap) if rle else bitmap,
+            }
+            for room_number, bitmap in calendar.items()
+        ],
+    )
+
+
 @views.route("/rentals/")
 @views.route("/rentals/<int:rental_id>")
 def rentals(rental_id=None):
@@ -1401,13 +1486,26 @@ def rentals(rental_id=None):
                         rentals.paid_amount
                 FROM rentals
             """
+    size = page_size()
+    after = page_after(uuid_text)
+
     cursor = db.cursor()
-    cursor.execute(query)
-    rentals = cursor.fetchall()
+    if after is not None:
+        cursor.execute(
+            query + " WHERE rentals.rental_id > %s ORDER BY rentals.rental_id LIMIT %s",
+            (after[0], size + 1),
+        )
+    else:
+        cursor.execute(query + " ORDER BY rentals.rental_id LIMIT %s", (size + 1,))
+    rentals, next_url = paginate(cursor.fetchall(), size, (0,))
 
     cursor.close()
     return render_template(
-        "rentals.html", session=session, rental_id=rental_id, rentals=rentals
+        "rentals.html",
+        session=session,
+        rental_id=rental_id,
+        rentals=rentals,
+        next_url=next_url,
     )
 
 
@@ -1420,71 +1518,78 @@ def view_one():
                         num_available_rooms
                 FROM available_rooms_per_area
             """
+    order_by = " ORDER BY country, province_or_state, city"
     cursor = db.cursor()
 
-    countries_query = r"""SELECT DISTINCT country
-                            FROM hotels
-                            ORDER BY country
-                        """
-    cursor.execute(countries_query)
-    countries = cursor.fetchall()
-    countries = [country[0] for country in countries]
-
-    provinces_or_states_query = r"""SELECT DISTINCT province_or_state
-                                    FROM hotels
-                                    ORDER BY province_or_state
-                                """
-    cursor.execute(provinces_or_states_query)
-    provinces_or_states = cursor.fetchall()
-    provinces_or_states = [
-        province_or_state[0] for province_or_state in provinces_or_states
-    ]
-
-    cities_query = r"""SELECT DISTINCT city
-                        FROM hotels
-                        ORDER BY city
-                    """
-    cursor.execute(cities_query)
-    cities = cursor.fetchall()
-    cities = [city[0] for city in cities]
+    facets = get_facets()
 
-    if request.method == "GET":
-        cursor.execute(query)
-        rooms = cursor.fetchall()
-    elif request.method == "POST":
+    cursor.execute(
+        r"""SELECT refreshed_at
+            FROM view_refreshes
+            WHERE view_name = 'available_rooms_per_area'
+        """
+    )
+    refreshed_at = cursor.fetchone()
+    if refreshed_at is not None:
+        refreshed_at = refreshed_at[0]
+    is_stale = refreshed_at is None or (
+        datetime.now(timezone.utc) - refreshed_at
+    ) > timedelta(seconds=EHOTELS_AREA_STALE_AFTER)
+
+    search = Query(query)
+    if request.method == "POST":
         form = request.form
-        data = (
-            request.form.get("country"),
-            request.form.get("province-or-state"),
-            request.form.get("city"),
-        )
-        data = tuple(filter(lambda x: x is not None and x != "", data))
-
-        cursor.execute(
-            query
-            + " WHERE 1=1"
-            + (" AND country = %s" if request.form.get("country") else "")
-            + (
-                " AND province_or_state = %s"
-                if request.form.get("province-or-state")
-                else ""
-            )
-            + (" AND city = %s" if request.form.get("city") else ""),
-            data,
-        )
-        rooms = cursor.fetchall()
+        search.filter(AREA_FILTERS, request.form)
+    search.execute(cursor, order_by)
+    rooms = cursor.fetchall()
 
     cursor.close()
     return render_template(
         "view_one.html",
         form=form,
-        countries=countries,
-        provinces_or_states=provinces_or_states,
-        cities=cities,
+        refreshed_at=refreshed_at,
+        is_stale=is_stale,
+        countries=facets["countries"],
+        provinces_or_states=facets["provinces_or_states"],
+        cities=facets["cities"],
         rooms=rooms,
     )
 
 
+@views.route("/reports/occupancy", methods=["GET", "POST"])
+def occupancy():
+    user = session.get("user")
+    if user is None or user.get("type") != "employee":
+        abort(403)
+
+    form = request.form if request.method == "POST" else None
+    group = (form or {}).get("group", "chain")
+    start_date, end_date = default_period()
+    report = []
+    try:
+        if form is not None:
+            start_date = form_value(form, "start-date", iso_date) or start_date
+            end_date = form_value(form, "end-date", iso_date) or end_date
+        report = occupancy_report(group, start_date, end_date, form)
+    except ValueError as e:
+        flash(str(e), "danger")
+    refreshed_at, pending = report_freshness()
+
+    return render_template(
+        "occupancy.html",
+        session=session,
+        form=form,
+        group=group,
+        groups=REPORT_GROUPS,
+        start_date=start_date,
+        end_date=end_date,
+        report=report,
+        refreshed_at=refreshed_at,
+        pending=pending,
+        **get_facets(),
+    )
+
+
 @views.route("/view-two/", methods=["GET", "POST"])
 def view_two(hotel_id=None):
     query = r"""SELECT chain_name,
@@ -1496,18 +1601,25 @@ def view_two(hotel_id=None):
                         capacity
                 FROM room_capacities
             """
-    cursor = db.cursor()
-
     if request.method == "GET":
-        cursor.execute(query)
-        capacities = cursor.fetchall()
+        capacities = stream_rows(query)
+        if request.args.get("stream") == "csv":
+            return stream_csv(
+                "room_capacities.csv", ROOM_CAPACITIES_CSV_HEADER, capacities
+            )
     elif request.method == "POST":
-        cursor.execute(query + " WHERE hotel_id = %s", (request.form.get("hotel-id"),))
-        capacities = cursor.fetchall()
-
-    db.commit()
-    cursor.close()
-    return render_template(
+        # Checked before anything is streamed: an error after that would cut
+        # the response short instead of showing an error page
+        try:
+            hotel_id = form_value(request.form, "hotel-id", positive_int, "hotel id")
+            if hotel_id is None:
+                raise ValueError("Hotel ID cannot be empty")
+        except ValueError as e:
+            flash(str(e), "danger")
+            return render_template("view_two.html", capacities=[]), 400
+        capacities = stream_rows(query + " WHERE hotel_id = %s", (hotel_id,))
+
+    return stream_html(
         "view_two.html",
         capacities=capacities,
     )
@@ -1530,6 +1642,7 @@ def new_chain():
                 if chain_id is not None:
                     flash("Successfully added chain", "success")
                 db.commit()
+                invalidate_facets()
                 cursor.close()
             except IntegrityError:
                 flash("Unable to add chain", "danger")
@@ -1572,6 +1685,7 @@ def new_room():
                 flash("Successfully added room", "success")
 
             db.commit()
+            invalidate_facets()
             cursor.close()
         except IntegrityError:
             flash("Unable to add room", "danger")
@@ -1614,6 +1728,7 @@ def new_hotel():
             if hotel_id is not None:
                 flash("Successfully added hotel", "success")
             db.commit()
+            invalidate_facets()
             cursor.close()
         except IntegrityError:
             flash("Unable to add hotel", "danger")
@@ -1621,3 +1736,30 @@ def new_hotel():
             traceback.print_exc()
 
     return render_template("new_hotel.html", session=session, chains=chains)
+
+
+@views.route("/import/", methods=["GET", "POST"])
+def import_inventory():
+    if request.method == "POST":
+        user = session.get("user")
+        if user is None or user.get("type") != "employee":
+            flash("Only employees can import inventory", "danger")
+        elif request.files.get("file") is None or request.files["file"].filename == "":
+            flash("Choose a file to import", "danger")
+        else:
+            file = request.files["file"]
+            file_format = (
+                "json"
+                if file.filename.lower().endswith((".json", ".jsonl", ".ndjson"))
+                else "csv"
+            )
+            kind = request.form.get("kind")
+            merged, errors = import_file(kind, file.stream, file_format)
+            for error in errors:
+                flash(error, "danger")
+            if not errors:
+                flash(f"Successfully imported {merged} {kind}", "success")
+
+    return render_template(
+        "import.html", session=session, import_columns=IMPORT_COLUMNS
+    )
@@ -0,0 +1,6 @@
+import os
+
+from website import create_app
+
+# Entry point for production servers: gunicorn -c gunicorn.conf.py wsgi:app
+app = create_app(remote=os.environ.get("EHOTELS_REMOTE", "0") != "0")